@@ -0,0 +1,108 @@
+"""Exact-match response cache for chat turns and tool results."""
+
+from typing import Any, Optional
+from pathlib import Path
+import hashlib
+import sqlite3
+import threading
+import orjson
+from .config import CACHE_FILE
+
+# Cache policies: read+write, bypass, or read-only (misses are errors)
+CACHE_MODES = ("on", "off", "replay")
+
+
+class CacheMiss(RuntimeError):
+    """Raised on a cache miss in replay mode."""
+
+
+class ResponseCache:
+    """
+    SQLite-backed store of JSON-serializable values keyed by SHA256.
+
+    Keys are computed over the cache namespace plus the caller's key parts,
+    so a new namespace (e.g. a different model or regenerated data) never
+    serves stale entries. Safe to use from the worker threads that run tools.
+    """
+
+    def __init__(
+        self, path: str = CACHE_FILE, mode: str = "on", namespace: str = ""
+    ) -> None:
+        """
+        Open (or create) the cache database.
+
+        Args:
+            path: SQLite database file
+            mode: One of CACHE_MODES
+            namespace: Prefix mixed into every key
+
+        Raises:
+            ValueError: If mode is not one of CACHE_MODES
+        """
+        if mode not in CACHE_MODES:
+            raise ValueError(
+                f"Unknown cache mode: {mode} (expected one of {CACHE_MODES})"
+            )
+
+        self.mode = mode
+        self.namespace = namespace
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+        if mode != "off":
+            db_path = Path(path)
+            db_path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(db_path), check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value BLOB)"
+            )
+
+    def key(self, *parts: Any) -> str:
+        """Hash the namespace and parts into a cache key."""
+        payload = orjson.dumps([self.namespace, *parts], option=orjson.OPT_SORT_KEYS)
+        return hashlib.sha256(payload).hexdigest()
+
+    def get(self, key: str) -> Optional[Any]:
+        """
+        Look up a cached value.
+
+        Args:
+            key: Key from key()
+
+        Returns:
+            Cached value, or None on a miss (always None when mode is "off")
+
+        Raises:
+            CacheMiss: On a miss in replay mode
+        """
+        if self._conn is None:
+            return None
+
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+
+        if row is None:
+            if self.mode == "replay":
+                raise CacheMiss("No cached response for this request (replay mode)")
+            return None
+        return orjson.loads(row[0])
+
+    def set(self, key: str, value: Any) -> None:
+        """Store a value; a no-op unless mode is "on"."""
+        if self._conn is None or self.mode != "on":
+            return
+
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value) VALUES (?, ?)",
+                (key, orjson.dumps(value)),
+            )
+            self._conn.commit()
+
+    def close(self) -> None:
+        """Close the database connection."""
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
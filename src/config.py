@@ -1,15 +1,23 @@
 """Configuration settings for the factory operations chatbot."""
 
 import os
-from typing import Optional
+from typing import List, Optional
 from dotenv import load_dotenv
 
 load_dotenv()
 
 API_KEY: Optional[str] = os.getenv("OPENROUTER_API_KEY")
 MODEL: str = os.getenv("OPENROUTER_MODEL", "anthropic/claude-3.5-sonnet")
+# Cheaper model for turns that need no factory data (greetings, thanks);
+# set OPENROUTER_ROUTER_MODEL to an empty string to send every turn to MODEL
+ROUTER_MODEL: str = os.getenv("OPENROUTER_ROUTER_MODEL", "openai/gpt-4o-mini")
 FACTORY_NAME: str = os.getenv("FACTORY_NAME", "Demo Factory")
 DATA_FILE: str = os.getenv("DATA_FILE", "./data/production.json")
+CACHE_FILE: str = os.getenv("CACHE_FILE", "./data/cache.sqlite")
+
+# Completion limits: answers are short Q&A, so cap worst-case length
+MAX_TOKENS: int = int(os.getenv("MAX_TOKENS", "512"))
+STOP_SEQUENCES: List[str] = ["\nUser:", "\n\nYou:"]
 
 # Voice interface settings
 TTS_VOICE: str = "alloy"  # OpenAI voice: alloy, echo, fable, onyx, nova, shimmer
@@ -7,51 +7,132 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 
 import streamlit as st
 import plotly.graph_objects as go
+import numpy as np
 import pandas as pd
-from datetime import datetime, timedelta
-from typing import Dict, Any, Optional
-from src.data import load_data, MACHINES
+from datetime import datetime
+from typing import Callable, Dict, Any, Optional
+from src.data import load_data, MACHINE_NAMES
 from src.metrics import (
     calculate_oee,
+    calculate_oee_daily,
     get_downtime_analysis,
     get_quality_issues,
     get_scrap_metrics,
+    get_scrap_metrics_daily,
 )
 
 # Page config
 st.set_page_config(page_title="Factory Dashboard", layout="wide")
 st.title("Factory Operations Dashboard")
 
-# Load data once
-data: Optional[Dict[str, Any]] = load_data()
-if data is None:
-    st.error("No production data found. Please generate data first using the CLI.")
-    st.stop()
 
-start_date: str = data["start_date"].split("T")[0]
-end_date: str = data["end_date"].split("T")[0]
+@st.cache_data(show_spinner=False, ttl=None)
+def _cached_load() -> Optional[Dict[str, Any]]:
+    """Load production data once and keep it in memory across reruns."""
+    return load_data()
 
-# Sidebar filter
-st.sidebar.header("Filters")
-machine_names: list[str] = [m["name"] for m in MACHINES]
-machine: str = st.sidebar.selectbox("Machine", ["All Machines"] + machine_names)
-machine_filter: Optional[str] = None if machine == "All Machines" else machine
 
-# Tabs
-tab1, tab2, tab3 = st.tabs(["OEE", "Availability", "Quality"])
+# Sidebar machine choices, built from the precomputed MACHINE_NAMES
+_MACHINE_OPTIONS: tuple[str, ...] = ("All Machines", *MACHINE_NAMES)
 
-# OEE Tab
-with tab1:
-    st.header("Overall Equipment Effectiveness")
+# Table dtypes, declared up front instead of inferred per column
+_EVENT_DTYPES: Dict[str, str] = {
+    "Date": "string",
+    "Machine": "category",
+    "Reason": "category",
+    "Description": "string",
+    "Hours": "float64",
+}
+_ISSUE_DTYPES: Dict[str, str] = {
+    "Date": "string",
+    "Machine": "category",
+    "Type": "category",
+    "Severity": "category",
+    "Parts": "int32",
+    "Description": "string",
+}
 
-    # Get metrics
-    metrics = calculate_oee(start_date, end_date, machine_filter)
+# Severity row colours: High, Medium, anything else
+_SEVERITY_CSS: tuple[str, str, str] = (
+    "background-color: #ff6b6b; color: white",
+    "background-color: #ffd93d; color: black",
+    "background-color: #95e1d3; color: black",
+)
 
-    # Gauge chart
-    fig_gauge = go.Figure(
+
+def _severity_styles(df: pd.DataFrame) -> pd.DataFrame:
+    """Return row highlight CSS for every cell based on the Severity column."""
+    css = np.select(
+        [df["Severity"].eq("High"), df["Severity"].eq("Medium")],
+        _SEVERITY_CSS[:2],
+        default=_SEVERITY_CSS[2],
+    )
+    return pd.DataFrame(
+        np.broadcast_to(css[:, None], df.shape), index=df.index, columns=df.columns
+    )
+
+
+def _date_range(start: datetime, end: datetime) -> list[str]:
+    """List every calendar day from start to end as YYYY-MM-DD strings."""
+    return pd.date_range(start.date(), end.date(), freq="D").strftime("%Y-%m-%d").tolist()
+
+
+def _daily_metric(
+    metric_fn: Callable[[str, str, Optional[str]], pd.DataFrame],
+    dates: tuple[str, ...],
+    machine: Optional[str],
+) -> pd.DataFrame:
+    """Run a batched daily metric and align it to every day in dates."""
+    index = pd.Index(dates, name="date")
+    return metric_fn(dates[0], dates[-1], machine).reindex(index)
+
+
+# Metric results keyed on (start, end, machine); arguments are small strings
+@st.cache_data(show_spinner=False, max_entries=1024)
+def _oee(start: str, end: str, machine: Optional[str]) -> Dict[str, Any]:
+    """Cached calculate_oee()."""
+    return calculate_oee(start, end, machine)
+
+
+@st.cache_data(show_spinner=False, max_entries=1024)
+def _oee_daily(dates: tuple[str, ...], machine: Optional[str]) -> pd.DataFrame:
+    """Cached calculate_oee_daily(), one row per calendar day."""
+    return _daily_metric(calculate_oee_daily, dates, machine)
+
+
+@st.cache_data(show_spinner=False, max_entries=1024)
+def _downtime(start: str, end: str, machine: Optional[str]) -> Dict[str, Any]:
+    """Cached get_downtime_analysis()."""
+    return get_downtime_analysis(start, end, machine)
+
+
+@st.cache_data(show_spinner=False, max_entries=1024)
+def _quality(start: str, end: str, machine: Optional[str]) -> Dict[str, Any]:
+    """Cached get_quality_issues()."""
+    return get_quality_issues(start, end, machine_name=machine)
+
+
+@st.cache_data(show_spinner=False, max_entries=1024)
+def _scrap(start: str, end: str, machine: Optional[str]) -> Dict[str, Any]:
+    """Cached get_scrap_metrics()."""
+    return get_scrap_metrics(start, end, machine)
+
+
+@st.cache_data(show_spinner=False, max_entries=1024)
+def _scrap_daily(dates: tuple[str, ...], machine: Optional[str]) -> pd.DataFrame:
+    """Cached get_scrap_metrics_daily(), one row per calendar day."""
+    return _daily_metric(get_scrap_metrics_daily, dates, machine)
+
+
+# Figures are rebuilt only when their inputs change; stable chart keys let
+# the frontend update an existing plot instead of recreating it
+@st.cache_data(show_spinner=False, max_entries=1024)
+def _build_gauge(oee_value: float) -> go.Figure:
+    """Build the OEE gauge chart for an OEE percentage."""
+    fig = go.Figure(
         go.Indicator(
             mode="gauge+number+delta",
-            value=metrics["oee"] * 100,
+            value=oee_value,
             title={"text": "Current OEE %"},
             delta={"reference": 75, "suffix": "%"},
             gauge={
@@ -70,55 +151,45 @@ with tab1:
             },
         )
     )
-    fig_gauge.update_layout(height=400)
-    st.plotly_chart(fig_gauge, use_container_width=True)
+    fig.update_layout(height=400)
+    return fig
 
-    # Trend line chart
-    # Calculate daily OEE inline
-    daily_data: list[Dict[str, Any]] = []
-    current: datetime = datetime.fromisoformat(start_date)
-    end_dt: datetime = datetime.fromisoformat(end_date)
-
-    while current <= end_dt:
-        date_str = current.strftime("%Y-%m-%d")
-        day_metrics = calculate_oee(date_str, date_str, machine_filter)
-        daily_data.append({"date": date_str, "oee": day_metrics["oee"] * 100})
-        current += timedelta(days=1)
-
-    df_oee = pd.DataFrame(daily_data)
-
-    fig_trend = go.Figure()
-    fig_trend.add_trace(
-        go.Scatter(
-            x=df_oee["date"],
-            y=df_oee["oee"],
-            mode="lines+markers",
-            name="OEE %",
-            line=dict(color="royalblue", width=3),
-        )
-    )
-    fig_trend.update_layout(
-        title="OEE Trend Over Time",
-        xaxis_title="Date",
-        yaxis_title="OEE %",
-        height=400,
-        yaxis=dict(range=[0, 100]),
-    )
-    st.plotly_chart(fig_trend, use_container_width=True)
 
-# Availability Tab
-with tab2:
-    st.header("Availability & Downtime")
+@st.cache_data(show_spinner=False, max_entries=1024)
+def _build_trend(daily_oee: pd.DataFrame) -> go.Figure:
+    """Build the OEE trend chart from calculate_oee_daily() output."""
+    df_oee = daily_oee.reset_index()
+    df_oee["oee"] = df_oee["oee"] * 100
 
-    # Get downtime data
-    downtime_data = get_downtime_analysis(start_date, end_date, machine_filter)
+    fig = go.Figure()
+    # Apply trace and layout changes in a single relayout
+    with fig.batch_update():
+        fig.add_trace(
+            go.Scattergl(
+                x=df_oee["date"],
+                y=df_oee["oee"],
+                mode="lines+markers",
+                name="OEE %",
+                line=dict(color="royalblue", width=3),
+            )
+        )
+        fig.update_layout(
+            title="OEE Trend Over Time",
+            xaxis_title="Date",
+            yaxis_title="OEE %",
+            height=400,
+            yaxis=dict(range=[0, 100]),
+        )
+    return fig
 
-    # Downtime by reason bar chart
-    downtime_by_reason = downtime_data.get("downtime_by_reason", {})
 
-    if downtime_by_reason:
-        fig_downtime = go.Figure()
-        fig_downtime.add_trace(
+@st.cache_data(show_spinner=False, max_entries=1024)
+def _build_downtime(downtime_by_reason: Dict[str, float]) -> go.Figure:
+    """Build the downtime-by-reason bar chart."""
+    fig = go.Figure()
+    # Apply trace and layout changes in a single relayout
+    with fig.batch_update():
+        fig.add_trace(
             go.Bar(
                 y=list(downtime_by_reason.keys()),
                 x=list(downtime_by_reason.values()),
@@ -126,13 +197,99 @@ with tab2:
                 marker=dict(color="indianred"),
             )
         )
-        fig_downtime.update_layout(
+        fig.update_layout(
             title="Total Downtime by Reason (Hours)",
             xaxis_title="Hours",
             yaxis_title="Reason",
             height=400,
         )
-        st.plotly_chart(fig_downtime, use_container_width=True)
+    return fig
+
+
+@st.cache_data(show_spinner=False, max_entries=1024)
+def _build_scrap(daily_scrap: pd.DataFrame) -> go.Figure:
+    """Build the scrap rate trend chart from get_scrap_metrics_daily() output."""
+    df_scrap = daily_scrap.reset_index()
+    df_scrap["scrap_rate"] = df_scrap["scrap_rate"] * 100
+
+    fig = go.Figure()
+    # Apply trace and layout changes in a single relayout
+    with fig.batch_update():
+        fig.add_trace(
+            go.Scattergl(
+                x=df_scrap["date"],
+                y=df_scrap["scrap_rate"],
+                mode="lines+markers",
+                name="Scrap Rate %",
+                line=dict(color="crimson", width=3),
+                fill="tozeroy",
+                fillcolor="rgba(220, 20, 60, 0.2)",
+            )
+        )
+        fig.update_layout(
+            title="Scrap Rate Trend",
+            xaxis_title="Date",
+            yaxis_title="Scrap Rate %",
+            height=400,
+        )
+    return fig
+
+
+# Load data once
+data: Optional[Dict[str, Any]] = _cached_load()
+if data is None:
+    # Don't keep the miss cached, so the next rerun picks up new data
+    _cached_load.clear()
+    st.error("No production data found. Please generate data first using the CLI.")
+    st.stop()
+
+# Parse the data range once; every tab works from these
+START_DT: datetime = datetime.fromisoformat(data["start_date"])
+END_DT: datetime = datetime.fromisoformat(data["end_date"])
+DATE_STRS: tuple[str, ...] = tuple(_date_range(START_DT, END_DT))
+start_date: str = DATE_STRS[0]
+end_date: str = DATE_STRS[-1]
+
+# Sidebar filter
+st.sidebar.header("Filters")
+machine: str = st.sidebar.selectbox("Machine", _MACHINE_OPTIONS)
+machine_filter: Optional[str] = None if machine == "All Machines" else machine
+
+# Data only changes on regeneration, so reload is explicit (clears all caches)
+st.sidebar.button("Reload data", on_click=st.cache_data.clear)
+
+# Tabs
+tab1, tab2, tab3 = st.tabs(["OEE", "Availability", "Quality"])
+
+# OEE Tab
+with tab1:
+    st.header("Overall Equipment Effectiveness")
+
+    # Get metrics
+    metrics = _oee(start_date, end_date, machine_filter)
+
+    # Gauge chart
+    fig_gauge = _build_gauge(metrics["oee"] * 100)
+    st.plotly_chart(fig_gauge, use_container_width=True, key="oee_gauge")
+
+    # Trend line chart
+    # Daily OEE for the whole range in one pass
+    fig_trend = _build_trend(_oee_daily(DATE_STRS, machine_filter))
+    st.plotly_chart(fig_trend, use_container_width=True, key="oee_trend")
+
+# Availability Tab
+with tab2:
+    st.header("Availability & Downtime")
+
+    # Get downtime data
+    downtime_data = _downtime(start_date, end_date, machine_filter)
+
+    # Downtime by reason bar chart
+    downtime_by_reason = downtime_data.get("downtime_by_reason", {})
+
+    if downtime_by_reason:
+        fig_downtime = _build_downtime(downtime_by_reason)
+        st.plotly_chart(fig_downtime, use_container_width=True, key="downtime_by_reason")
     else:
         st.info("No downtime data available for this period")
 
@@ -141,8 +298,14 @@ with tab2:
     major_events = downtime_data.get("major_events", [])
 
     if major_events:
-        df_events = pd.DataFrame(major_events)
-        df_events.columns = ["Date", "Machine", "Reason", "Description", "Hours"]
+        # Explicit columns and dtypes skip per-column type inference
+        df_events = pd.DataFrame.from_records(
+            [
+                (e["date"], e["machine"], e["reason"], e["description"], e["duration_hours"])
+                for e in major_events
+            ],
+            columns=["Date", "Machine", "Reason", "Description", "Hours"],
+        ).astype(_EVENT_DTYPES)
         st.dataframe(df_events, use_container_width=True, hide_index=True)
     else:
         st.info("No major downtime events in this period")
@@ -152,74 +315,35 @@ with tab3:
     st.header("Quality Metrics")
 
     # Get quality data
-    quality_data = get_quality_issues(
-        start_date, end_date, machine_name=machine_filter
-    )
-    scrap_data = get_scrap_metrics(start_date, end_date, machine_filter)
+    quality_data = _quality(start_date, end_date, machine_filter)
+    scrap_data = _scrap(start_date, end_date, machine_filter)
 
     # Scrap rate trend
-    daily_scrap: list[Dict[str, Any]] = []
-    current: datetime = datetime.fromisoformat(start_date)
-    end_dt: datetime = datetime.fromisoformat(end_date)
-
-    while current <= end_dt:
-        date_str = current.strftime("%Y-%m-%d")
-        day_scrap = get_scrap_metrics(date_str, date_str, machine_filter)
-        daily_scrap.append(
-            {"date": date_str, "scrap_rate": day_scrap["scrap_rate"] * 100}
-        )
-        current += timedelta(days=1)
-
-    df_scrap = pd.DataFrame(daily_scrap)
-
-    fig_scrap = go.Figure()
-    fig_scrap.add_trace(
-        go.Scatter(
-            x=df_scrap["date"],
-            y=df_scrap["scrap_rate"],
-            mode="lines+markers",
-            name="Scrap Rate %",
-            line=dict(color="crimson", width=3),
-            fill="tozeroy",
-            fillcolor="rgba(220, 20, 60, 0.2)",
-        )
-    )
-    fig_scrap.update_layout(
-        title="Scrap Rate Trend",
-        xaxis_title="Date",
-        yaxis_title="Scrap Rate %",
-        height=400,
-    )
-    st.plotly_chart(fig_scrap, use_container_width=True)
+    fig_scrap = _build_scrap(_scrap_daily(DATE_STRS, machine_filter))
+    st.plotly_chart(fig_scrap, use_container_width=True, key="scrap_trend")
 
     # Quality issues table
     st.subheader("Quality Issues")
 
     if quality_data.get("issues"):
-        df_issues = pd.DataFrame(quality_data["issues"])
-        # Reorder columns: date, machine, type, severity, parts_affected, description
-        df_issues = df_issues[
-            ["date", "machine", "type", "severity", "parts_affected", "description"]
-        ]
-        df_issues.columns = [
-            "Date",
-            "Machine",
-            "Type",
-            "Severity",
-            "Parts",
-            "Description",
-        ]
-
-        # Color-code by severity
-        def highlight_severity(row: pd.Series) -> list[str]:
-            """Highlight rows based on severity level."""
-            if row["Severity"] == "High":
-                return ["background-color: #ff6b6b; color: white"] * len(row)
-            elif row["Severity"] == "Medium":
-                return ["background-color: #ffd93d; color: black"] * len(row)
-            return ["background-color: #95e1d3; color: black"] * len(row)
-
-        styled_df = df_issues.style.apply(highlight_severity, axis=1)
+        # Columns: date, machine, type, severity, parts_affected, description
+        df_issues = pd.DataFrame.from_records(
+            [
+                (
+                    i["date"],
+                    i["machine"],
+                    i["type"],
+                    i["severity"],
+                    i["parts_affected"],
+                    i["description"],
+                )
+                for i in quality_data["issues"]
+            ],
+            columns=["Date", "Machine", "Type", "Severity", "Parts", "Description"],
+        ).astype(_ISSUE_DTYPES)
+
+        # Color-code by severity, one vectorized pass over the whole table
+        styled_df = df_issues.style.apply(_severity_styles, axis=None)
         st.dataframe(styled_df, use_container_width=True, hide_index=True)
     else:
         st.success("No quality issues in this period")
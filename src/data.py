@@ -1,9 +1,13 @@
 """Data storage and management for factory production metrics."""
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, NamedTuple, Optional, Tuple
+import bisect
+from collections import defaultdict
 from datetime import datetime, timedelta
-import json
-import random
 from pathlib import Path
+import mmap
+import numpy as np
+import orjson
+import pandas as pd
 from .config import DATA_FILE
 
 # Simple in-memory data structures
@@ -19,6 +23,10 @@ SHIFTS = [
     {"id": 2, "name": "Night", "start_hour": 14, "end_hour": 22},
 ]
 
+# Name lists over the constants above, built once at import
+MACHINE_NAMES = tuple(m["name"] for m in MACHINES)
+SHIFT_NAMES = tuple(s["name"] for s in SHIFTS)
+
 DEFECT_TYPES = {
     "dimensional": {"severity": "High", "description": "Out of tolerance"},
     "surface": {"severity": "Medium", "description": "Surface defect"},
@@ -34,28 +42,202 @@ DOWNTIME_REASONS = {
     "maintenance": "Scheduled maintenance",
 }
 
+# Columnar layout: one row per (date, machine)
+FRAME_COLUMNS = [
+    "date",
+    "machine",
+    "parts_produced",
+    "good_parts",
+    "scrap_parts",
+    "scrap_rate",
+    "uptime_hours",
+    "downtime_hours",
+    "downtime_events",
+    "quality_issues",
+    "shifts",
+]
+# Nested per-record values, stored as JSON strings in the columnar copy
+NESTED_COLUMNS = ("downtime_events", "quality_issues", "shifts")
+# Companion tables with one row per nested item, keyed by its record's
+# (date, machine); the remaining columns are the item's own fields
+EVENT_COLUMNS: Dict[str, List[str]] = {
+    "quality_issues": ["date", "machine", "type", "description", "parts_affected", "severity"],
+    "downtime_events": ["date", "machine", "reason", "description", "duration_hours"],
+}
+# Numeric per-record values used by the metric aggregations
+METRIC_COLUMNS = [
+    "parts_produced",
+    "good_parts",
+    "scrap_parts",
+    "scrap_rate",
+    "uptime_hours",
+    "downtime_hours",
+]
+
+# Resolved once; only writers need the directory to exist
+_DATA_PATH = Path(DATA_FILE)
+
+# Parsed production data, keyed on the data file's path and modification time
+_cached_data: Optional[Tuple[Tuple[str, int], Dict[str, Any]]] = None
+
+
+class MetricArrays(NamedTuple):
+    """Per-(date, machine) metrics as 2-D arrays indexed [date, machine]."""
+    dates: List[str]
+    machines: Dict[str, int]
+    present: np.ndarray
+    parts: np.ndarray
+    good: np.ndarray
+    scrap: np.ndarray
+    uptime: np.ndarray
+    downtime: np.ndarray
+    # Per-range totals memoized by the metric functions for these arrays
+    range_totals: Dict[Tuple[str, str, Optional[str]], Any]
+
+    def date_slice(self, start_date: str, end_date: str) -> slice:
+        """Row slice covering start_date..end_date (inclusive, YYYY-MM-DD or ISO).
+
+        A reversed range (start after end) gives an empty slice, never one
+        with stop < start.
+        """
+        start = bisect.bisect_left(self.dates, start_date.split('T')[0])
+        end = bisect.bisect_right(self.dates, end_date.split('T')[0])
+        return slice(start, max(start, end))
+
+
+# Metric arrays, keyed the same way
+_metric_arrays: Optional[Tuple[Tuple[str, int], MetricArrays]] = None
+# Event tables by kind, keyed the same way
+_event_frames: Dict[str, Tuple[Tuple[str, int], pd.DataFrame]] = {}
+
+
+def get_data_path(create: bool = False) -> Path:
+    """
+    Get path to data file.
+
+    Args:
+        create: Create the parent directory if needed (for writers)
+
+    Returns:
+        Path to the JSON data file
+    """
+    if create:
+        _DATA_PATH.parent.mkdir(parents=True, exist_ok=True)
+    return _DATA_PATH
 
-def get_data_path() -> Path:
-    """Get path to data file, creating directory if needed."""
-    path = Path(DATA_FILE)
-    path.parent.mkdir(parents=True, exist_ok=True)
-    return path
 
+def get_frame_path() -> Path:
+    """Get path to the columnar (Parquet) copy of the data file."""
+    return get_data_path().with_suffix(".parquet")
 
-def save_data(data: Dict[str, Any]) -> None:
-    """Save production data to JSON file."""
+
+def get_events_path(kind: str) -> Path:
+    """Get path to the Parquet table for one EVENT_COLUMNS kind."""
     path = get_data_path()
+    return path.with_name(f"{path.stem}.{kind}.parquet")
+
+
+def events_frame(data: Dict[str, Any], kind: str) -> pd.DataFrame:
+    """
+    Flatten one kind of nested item into one row per item.
+
+    Args:
+        data: Production data as returned by load_data()
+        kind: A key of EVENT_COLUMNS
+
+    Returns:
+        DataFrame with EVENT_COLUMNS[kind], in date, machine, list order.
+    """
+    columns = EVENT_COLUMNS[kind]
+    production = data["production"]
+    records = [
+        (date, machine, *(item.get(column) for column in columns[2:]))
+        for date in sorted(production)
+        for machine, m_data in production[date].items()
+        for item in m_data.get(kind, [])
+    ]
+    df = pd.DataFrame.from_records(records, columns=columns)
+    df["machine"] = df["machine"].astype("category")
+    return df
+
+
+def production_frame(data: Dict[str, Any]) -> pd.DataFrame:
+    """
+    Flatten production data into one row per (date, machine).
+
+    Args:
+        data: Production data as returned by load_data()
+
+    Returns:
+        DataFrame with FRAME_COLUMNS; NESTED_COLUMNS hold JSON strings.
+    """
+    records = []
+    for date, day_data in data["production"].items():
+        for machine, m_data in day_data.items():
+            record = {"date": date, "machine": machine}
+            for column in FRAME_COLUMNS[2:]:
+                value = m_data.get(column)
+                if column in NESTED_COLUMNS:
+                    value = orjson.dumps(value).decode()
+                record[column] = value
+            records.append(record)
+    df = pd.DataFrame.from_records(records, columns=FRAME_COLUMNS)
+    # Few distinct machines: store integer codes instead of repeated strings
+    df["machine"] = df["machine"].astype("category")
+    return df
+
+
+def save_data(data: Dict[str, Any], pretty: bool = False) -> None:
+    """
+    Save production data to JSON file, plus a columnar Parquet copy.
+
+    Args:
+        data: Production data to save
+        pretty: Indent the JSON for human reading (default: compact)
+    """
+    path = get_data_path(create=True)
     try:
-        with open(path, 'w') as f:
-            json.dump(data, f, indent=2, default=str)
+        with open(path, 'wb') as f:
+            f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2 if pretty else 0))
     except (IOError, OSError) as e:
         raise RuntimeError(f"Failed to save data to {path}: {e}")
 
+    # Written after the JSON so it is never older than the file it mirrors
+    frame_path = get_frame_path()
+    try:
+        production_frame(data).to_parquet(frame_path, compression="zstd", index=False)
+    except ImportError:
+        pass  # pyarrow not installed; load_frame() falls back to the JSON file
+    except (IOError, OSError) as e:
+        raise RuntimeError(f"Failed to save data to {frame_path}: {e}")
+
+    for kind in EVENT_COLUMNS:
+        events_path = get_events_path(kind)
+        try:
+            events_frame(data, kind).to_parquet(events_path, compression="zstd", index=False)
+        except ImportError:
+            break  # pyarrow not installed; load_events() falls back to the JSON file
+        except (IOError, OSError) as e:
+            raise RuntimeError(f"Failed to save data to {events_path}: {e}")
+
+    invalidate_data_cache()
+
+
+def invalidate_data_cache() -> None:
+    """Drop the cached data and frames so the next load re-reads the files."""
+    global _cached_data, _metric_arrays
+    _cached_data = None
+    _metric_arrays = None
+    _event_frames.clear()
+
 
 def load_data() -> Optional[Dict[str, Any]]:
     """
     Load production data from JSON file.
 
+    The file is memory-mapped and parsed straight from the mapped bytes, so
+    the OS pages it in without an intermediate copy.
+
     Returns:
         Dictionary containing production data, or None if file doesn't exist.
     """
@@ -63,25 +245,169 @@ def load_data() -> Optional[Dict[str, Any]]:
     if not path.exists():
         return None
     try:
-        with open(path, 'r') as f:
-            return json.load(f)
-    except json.JSONDecodeError as e:
+        with open(path, 'rb') as f:
+            try:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except (ValueError, OSError):
+                # Empty files and some filesystems can't be mapped
+                return orjson.loads(f.read())
+            with mapped, memoryview(mapped) as view:
+                return orjson.loads(view)
+    except orjson.JSONDecodeError as e:
         raise RuntimeError(f"Failed to parse JSON from {path}: {e}")
     except (IOError, OSError) as e:
         raise RuntimeError(f"Failed to read data from {path}: {e}")
 
 
+def load_frame(columns: Optional[List[str]] = None) -> Optional[pd.DataFrame]:
+    """
+    Load production data as a flat DataFrame with one row per (date, machine).
+
+    Reads only the requested columns from the Parquet copy when it is up to
+    date with the JSON file, otherwise flattens the JSON data.
+
+    Args:
+        columns: Optional subset of FRAME_COLUMNS to load (default: all)
+
+    Returns:
+        DataFrame of production records, or None if file doesn't exist.
+    """
+    path = get_data_path()
+    if not path.exists():
+        return None
+
+    frame_path = get_frame_path()
+    if frame_path.exists() and frame_path.stat().st_mtime >= path.stat().st_mtime:
+        try:
+            return pd.read_parquet(frame_path, columns=columns)
+        except ImportError:
+            pass  # pyarrow not installed
+        except (IOError, OSError, ValueError):
+            pass  # Unreadable copy; the JSON file is authoritative
+
+    df = production_frame(load_data())
+    return df[columns] if columns else df
+
+
+def load_metric_arrays() -> Optional[MetricArrays]:
+    """
+    Load the numeric production metrics as (date, machine) NumPy arrays.
+
+    Built once per version of the data file. Dates are sorted so a range is
+    a row slice (MetricArrays.date_slice()); machines keep their order in
+    the data. Cells with no record are zero and False in present. Callers
+    must not modify the arrays.
+
+    Returns:
+        MetricArrays, or None if file doesn't exist.
+    """
+    global _metric_arrays
+    path = get_data_path()
+    if not path.exists():
+        return None
+
+    key = (str(path), path.stat().st_mtime_ns)
+    if _metric_arrays is None or _metric_arrays[0] != key:
+        df = load_frame(columns=["date", "machine", *METRIC_COLUMNS])
+        dates = sorted(df["date"].unique().tolist())
+        machines = {str(m): i for i, m in enumerate(pd.unique(df["machine"].astype(str)))}
+        rows = np.searchsorted(dates, df["date"].to_numpy())
+        cols = df["machine"].astype(str).map(machines).to_numpy()
+        shape = (len(dates), len(machines))
+
+        def grid(column: str, dtype: type) -> np.ndarray:
+            values = np.zeros(shape, dtype=dtype)
+            values[rows, cols] = df[column].to_numpy(dtype=dtype)
+            return values
+
+        present = np.zeros(shape, dtype=bool)
+        present[rows, cols] = True
+        _metric_arrays = (key, MetricArrays(
+            dates=dates,
+            machines=machines,
+            present=present,
+            parts=grid("parts_produced", np.int64),
+            good=grid("good_parts", np.int64),
+            scrap=grid("scrap_parts", np.int64),
+            uptime=grid("uptime_hours", np.float64),
+            downtime=grid("downtime_hours", np.float64),
+            range_totals={},
+        ))
+    return _metric_arrays[1]
+
+
+def load_events(kind: str) -> Optional[pd.DataFrame]:
+    """
+    Load one kind of nested item (quality issues or downtime events) as a table.
+
+    Reads the companion Parquet table when it is up to date with the JSON
+    file, otherwise flattens the JSON data. Built once per version of the
+    data file; callers must not modify it.
+
+    Args:
+        kind: A key of EVENT_COLUMNS
+
+    Returns:
+        DataFrame from events_frame(), or None if file doesn't exist.
+    """
+    path = get_data_path()
+    if not path.exists():
+        return None
+
+    key = (str(path), path.stat().st_mtime_ns)
+    cached = _event_frames.get(kind)
+    if cached is None or cached[0] != key:
+        df = None
+        events_path = get_events_path(kind)
+        if events_path.exists() and events_path.stat().st_mtime >= path.stat().st_mtime:
+            try:
+                df = pd.read_parquet(events_path)
+            except ImportError:
+                pass  # pyarrow not installed
+            except (IOError, OSError, ValueError):
+                pass  # Unreadable copy; the JSON file is authoritative
+        if df is None:
+            df = events_frame(load_cached_data(), kind)
+        cached = _event_frames[kind] = (key, df)
+    return cached[1]
+
+
+def load_cached_data() -> Optional[Dict[str, Any]]:
+    """
+    Load production data, parsing the JSON file once per version of it.
+
+    Repeated calls (e.g. several tool calls in one chat turn) share the same
+    dictionary. Callers must not modify it.
+
+    Returns:
+        Dictionary containing production data, or None if file doesn't exist.
+    """
+    global _cached_data
+    path = get_data_path()
+    if not path.exists():
+        return None
+
+    key = (str(path), path.stat().st_mtime_ns)
+    if _cached_data is None or _cached_data[0] != key:
+        _cached_data = (key, load_data())
+    return _cached_data[1]
+
+
 def data_exists() -> bool:
     """Check if data file exists."""
     return get_data_path().exists()
 
 
-def generate_production_data(days: int = 30) -> Dict[str, Any]:
+def generate_production_data(days: int = 30, seed: Optional[int] = None) -> Dict[str, Any]:
     """
     Generate simple production data with planted scenarios.
 
+    Random draws for every (day, machine) cell are made up front as NumPy
+    arrays; only the nested event/issue lists are built in Python.
+
     Args:
         days: Number of days of data to generate (default: 30)
+        seed: Optional random seed for reproducible data
 
     Returns:
         Dictionary containing production data with planted scenarios:
@@ -93,101 +419,138 @@ def generate_production_data(days: int = 30) -> Dict[str, Any]:
     end_date = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
     start_date = end_date - timedelta(days=days - 1)
 
-    production_data = {}
+    rng = np.random.default_rng(seed)
+    shape = (days, len(MACHINES))
+    day_idx = np.arange(days)[:, None]
+    names = np.array(MACHINE_NAMES)
+
+    # Scenario 1: Quality spike on day 15 for Assembly-001
+    quality_spike = (day_idx == 14) & (names == "Assembly-001")
+    # Scenario 2: Major breakdown on day 22 for Packaging-001
+    breakdown = (day_idx == 21) & (names == "Packaging-001")
+
+    # Base metrics
+    base_parts = 800 + rng.integers(-50, 51, shape)
+
+    # Scenario 3: Performance improvement over time (65% -> 80% OEE)
+    improvement_factor = 1.0 + (0.23 * day_idx / days)  # 23% improvement
+    parts_produced = (base_parts * improvement_factor).astype(int)
+    # Major production loss on breakdown
+    parts_produced = np.where(breakdown, (parts_produced * 0.5).astype(int), parts_produced)
+
+    # 12% defect rate on the quality spike vs normal 3%
+    scrap_rate = np.where(quality_spike, 0.12, 0.03)
+    # Normal minor downtime, 4 hours on breakdown
+    downtime_hours = np.where(breakdown, 4.0, rng.uniform(0.2, 0.8, shape))
+
+    # Calculate derived metrics
+    scrap_parts = (parts_produced * scrap_rate).astype(int)
+    good_parts = parts_produced - scrap_parts
+
+    # Scenario 4: Shift differences (night shift 5-8% lower)
+    shift_factor = np.array([0.93 if name == "Night" else 1.0 for name in SHIFT_NAMES])
+    shift_parts = (parts_produced[..., None] * 0.5 * shift_factor).astype(int)
+    shift_scrap = (scrap_parts[..., None] * 0.5 * shift_factor).astype(int)
+
+    # Draws for the randomly logged quality issues and downtime events
+    defect_names = list(DEFECT_TYPES)
+    has_issue = rng.random(shape) < 0.15  # 15% chance of minor issue
+    issue_type = rng.integers(0, len(defect_names), shape)
+    issue_parts = rng.integers(1, 6, shape)
+    spike_parts = rng.integers(5, 16, (days, len(MACHINES), 4))
+
+    reason_names = list(DOWNTIME_REASONS)
+    has_event = rng.random(shape) < 0.3  # 30% chance of logged downtime
+    event_reason = rng.integers(0, len(reason_names), shape)
+    event_hours = np.round(rng.uniform(0.1, 0.5, shape), 2)
+
+    # Convert to Python scalars once so the records serialize as plain JSON
+    parts_produced = parts_produced.tolist()
+    good_parts = good_parts.tolist()
+    scrap_parts = scrap_parts.tolist()
+    scrap_rate = scrap_rate.tolist()
+    downtime_hours = downtime_hours.tolist()
+    shift_parts = shift_parts.tolist()
+    shift_scrap = shift_scrap.tolist()
+
+    # One flat slot per (day, machine), filled in place
+    num_machines = len(MACHINES)
+    records: List[Optional[Dict[str, Any]]] = [None] * (days * num_machines)
 
-    current_date = start_date
     for day_num in range(days):
-        date_str = current_date.strftime("%Y-%m-%d")
-        production_data[date_str] = {}
-
-        for machine in MACHINES:
-            machine_name = machine["name"]
-
-            # Base metrics
-            base_parts = 800 + random.randint(-50, 50)
-
-            # Scenario 3: Performance improvement over time (65% -> 80% OEE)
-            improvement_factor = 1.0 + (0.23 * day_num / days)  # 23% improvement
-            parts_produced = int(base_parts * improvement_factor)
-
-            # Scenario 1: Quality spike on day 15 for Assembly-001
-            if day_num == 14 and machine_name == "Assembly-001":
-                scrap_rate = 0.12  # 12% defect rate (vs normal 3%)
+        for m_idx in range(num_machines):
+            if quality_spike[day_num, m_idx]:
                 quality_issues = [
                     {
                         "type": "assembly",
                         "description": "Loose fastener issue - tooling calibration required",
-                        "parts_affected": random.randint(5, 15),
+                        "parts_affected": int(parts),
                         "severity": "High"
                     }
-                    for _ in range(4)  # Multiple incidents
+                    for parts in spike_parts[day_num, m_idx]  # Multiple incidents
                 ]
+            elif has_issue[day_num, m_idx]:
+                defect_type = defect_names[issue_type[day_num, m_idx]]
+                quality_issues = [{
+                    "type": defect_type,
+                    "description": DEFECT_TYPES[defect_type]["description"],
+                    "parts_affected": int(issue_parts[day_num, m_idx]),
+                    "severity": DEFECT_TYPES[defect_type]["severity"]
+                }]
             else:
-                scrap_rate = 0.03  # Normal 3% defect rate
                 quality_issues = []
-                if random.random() < 0.15:  # 15% chance of minor issue
-                    defect_type = random.choice(list(DEFECT_TYPES.keys()))
-                    quality_issues = [{
-                        "type": defect_type,
-                        "description": DEFECT_TYPES[defect_type]["description"],
-                        "parts_affected": random.randint(1, 5),
-                        "severity": DEFECT_TYPES[defect_type]["severity"]
-                    }]
-
-            # Scenario 2: Major breakdown on day 22 for Packaging-001
-            if day_num == 21 and machine_name == "Packaging-001":
-                downtime_hours = 4.0
+
+            if breakdown[day_num, m_idx]:
                 downtime_events = [{
                     "reason": "mechanical",
                     "description": "Critical bearing failure requiring emergency replacement",
                     "duration_hours": 4.0
                 }]
-                parts_produced = int(parts_produced * 0.5)  # Major production loss
+            elif has_event[day_num, m_idx]:
+                reason = reason_names[event_reason[day_num, m_idx]]
+                downtime_events = [{
+                    "reason": reason,
+                    "description": DOWNTIME_REASONS[reason],
+                    "duration_hours": float(event_hours[day_num, m_idx])
+                }]
             else:
-                downtime_hours = random.uniform(0.2, 0.8)  # Normal minor downtime
                 downtime_events = []
-                if random.random() < 0.3:  # 30% chance of logged downtime
-                    reason = random.choice(list(DOWNTIME_REASONS.keys()))
-                    downtime_events = [{
-                        "reason": reason,
-                        "description": DOWNTIME_REASONS[reason],
-                        "duration_hours": round(random.uniform(0.1, 0.5), 2)
-                    }]
-
-            # Calculate derived metrics
-            scrap_parts = int(parts_produced * scrap_rate)
-            good_parts = parts_produced - scrap_parts
-
-            # Scenario 4: Shift differences (night shift 5-8% lower)
-            shift_metrics = {}
-            for shift in SHIFTS:
-                shift_name = shift["name"]
-                shift_factor = 0.93 if shift_name == "Night" else 1.0
-                shift_parts = int(parts_produced * 0.5 * shift_factor)
-                shift_scrap = int(scrap_parts * 0.5 * shift_factor)
 
+            downtime = downtime_hours[day_num][m_idx]
+            shift_metrics = {}
+            for s_idx, shift_name in enumerate(SHIFT_NAMES):
+                parts = shift_parts[day_num][m_idx][s_idx]
+                scrap = shift_scrap[day_num][m_idx][s_idx]
                 shift_metrics[shift_name] = {
-                    "parts_produced": shift_parts,
-                    "scrap_parts": shift_scrap,
-                    "good_parts": shift_parts - shift_scrap,
-                    "uptime_hours": 8.0 - (downtime_hours * 0.5),
-                    "downtime_hours": downtime_hours * 0.5
+                    "parts_produced": parts,
+                    "scrap_parts": scrap,
+                    "good_parts": parts - scrap,
+                    "uptime_hours": 8.0 - (downtime * 0.5),
+                    "downtime_hours": downtime * 0.5
                 }
 
             # Store machine data for this day
-            production_data[date_str][machine_name] = {
-                "parts_produced": parts_produced,
-                "good_parts": good_parts,
-                "scrap_parts": scrap_parts,
-                "scrap_rate": round(scrap_rate * 100, 2),
-                "uptime_hours": 16.0 - downtime_hours,
-                "downtime_hours": downtime_hours,
+            records[day_num * num_machines + m_idx] = {
+                "parts_produced": parts_produced[day_num][m_idx],
+                "good_parts": good_parts[day_num][m_idx],
+                "scrap_parts": scrap_parts[day_num][m_idx],
+                "scrap_rate": round(scrap_rate[day_num][m_idx] * 100, 2),
+                "uptime_hours": 16.0 - downtime,
+                "downtime_hours": downtime,
                 "downtime_events": downtime_events,
                 "quality_issues": quality_issues,
                 "shifts": shift_metrics
             }
 
-        current_date += timedelta(days=1)
+    # Nest the flat records by date and machine in a single pass
+    date_strs = [
+        (start_date + timedelta(days=day_num)).strftime("%Y-%m-%d")
+        for day_num in range(days)
+    ]
+    production_data: Dict[str, Dict[str, Any]] = defaultdict(dict)
+    for idx, record in enumerate(records):
+        day_num, m_idx = divmod(idx, num_machines)
+        production_data[date_strs[day_num]][MACHINE_NAMES[m_idx]] = record
 
     return {
         "generated_at": datetime.now().isoformat(),
@@ -195,20 +558,21 @@ def generate_production_data(days: int = 30) -> Dict[str, Any]:
         "end_date": end_date.isoformat(),
         "machines": MACHINES,
         "shifts": SHIFTS,
-        "production": production_data
+        "production": dict(production_data)
     }
 
 
-def initialize_data(days: int = 30) -> None:
+def initialize_data(days: int = 30, pretty: bool = False) -> None:
     """
     Generate and save production data.
 
     Args:
         days: Number of days of data to generate (default: 30)
+        pretty: Indent the JSON file for human reading (default: compact)
     """
     print(f"Generating {days} days of production data...")
     data = generate_production_data(days)
-    save_data(data)
+    save_data(data, pretty=pretty)
     print(f"✓ Generated data from {data['start_date']} to {data['end_date']}")
 
     # Print summary
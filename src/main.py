@@ -5,21 +5,65 @@ This module provides the main CLI interface for the factory operations chatbot.
 It handles user interaction, Claude API integration, and tool execution.
 """
 
+import asyncio
+import functools
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
-from typing import Any, Dict, List, Tuple
-import json
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Tuple
 import tempfile
 import wave
 from pathlib import Path
 
+import numpy as np
+import orjson
 import typer
 from rich.console import Console
 from rich.panel import Panel
-from rich.table import Table
-from openai import OpenAI
 
-from .config import API_KEY, MODEL, FACTORY_NAME, RECORDING_DURATION
-from .data import initialize_data, data_exists, load_data, MACHINES
+# openai and rich.table are imported where used, so setup/stats start fast
+if TYPE_CHECKING:
+    import httpx
+    from openai import AsyncOpenAI
+    from openai.types.chat import ChatCompletionMessage
+
+# Optional voice dependencies, imported once; None when not installed
+try:
+    import pyaudio as _pyaudio
+except ImportError:
+    _pyaudio = None
+
+try:
+    import miniaudio as _miniaudio
+except ImportError:
+    _miniaudio = None
+
+try:
+    import sounddevice as _sd
+except (ImportError, OSError):  # OSError: PortAudio library not found
+    _sd = None
+
+from .cache import ResponseCache
+from .config import (
+    API_KEY,
+    MODEL,
+    ROUTER_MODEL,
+    FACTORY_NAME,
+    RECORDING_DURATION,
+    CACHE_FILE,
+    MAX_TOKENS,
+    STOP_SEQUENCES,
+)
+from .data import (
+    initialize_data,
+    data_exists,
+    get_data_path,
+    load_cached_data,
+    load_data,
+    load_metric_arrays,
+    MACHINE_NAMES,
+)
 from .metrics import (
     calculate_oee,
     get_scrap_metrics,
@@ -27,6 +71,9 @@ from .metrics import (
     get_downtime_analysis,
 )
 
+# Machine list for the system prompt, joined once at import
+_MACHINE_NAMES = ", ".join(MACHINE_NAMES)
+
 # Initialize CLI app and console
 app = typer.Typer(help="Factory Operations Chatbot - Demo Application")
 console = Console()
@@ -40,10 +87,12 @@ def _record_audio(duration: int = 5) -> Path:
     Uses PyAudio for cross-platform recording. Caller must delete returned file.
 
     Code Flow:
-    1. Initialize PyAudio and configure recording parameters (16kHz, mono, 16-bit)
-    2. Open audio input stream and record in 1024-frame chunks
-    3. Clean up PyAudio resources (guaranteed via finally block)
-    4. Write audio data to temporary WAV file and return path
+    1. Configure recording parameters (16kHz, mono, 16-bit)
+    2. Open temporary WAV file and write its header
+    3. Open audio input stream and write 1024-frame chunks to the file as
+       they are recorded (input overflows drop frames instead of raising)
+    4. Clean up PyAudio resources and close the file (guaranteed via finally
+       block), then return path
 
     Args:
         duration: Recording duration in seconds (default: 5)
@@ -57,26 +106,35 @@ def _record_audio(duration: int = 5) -> Path:
         RuntimeError: If microphone access fails or not available
         OSError: If temporary file cannot be created
     """
-    try:
-        import pyaudio
-    except ImportError as e:
+    if _pyaudio is None:
         raise ImportError(
             "PyAudio not installed. Install with:\n"
             "  macOS: brew install portaudio && pip install pyaudio\n"
             "  Linux: sudo apt install portaudio19-dev && pip install pyaudio\n"
             "  Windows: pip install pyaudio"
-        ) from e
+        )
 
     # Configure audio recording (16kHz mono, 16-bit PCM for Whisper)
     CHUNK = 1024
-    FORMAT = pyaudio.paInt16
+    FORMAT = _pyaudio.paInt16
     CHANNELS = 1
     RATE = 16000
 
+    # Open the WAV file first so recorded chunks stream straight into it
+    temp_file = Path(tempfile.mktemp(suffix=".wav"))
+    try:
+        wf = wave.open(str(temp_file), "wb")
+    except OSError as e:
+        raise OSError(f"Failed to write audio file: {e}") from e
+
     audio = None
     stream = None
     try:
-        audio = pyaudio.PyAudio()
+        wf.setnchannels(CHANNELS)
+        wf.setsampwidth(_pyaudio.get_sample_size(FORMAT))
+        wf.setframerate(RATE)
+
+        audio = _pyaudio.PyAudio()
         stream = audio.open(
             format=FORMAT,
             channels=CHANNELS,
@@ -85,13 +143,14 @@ def _record_audio(duration: int = 5) -> Path:
             frames_per_buffer=CHUNK,
         )
 
-        # Record audio in chunks
-        frames = []
+        # Record audio in chunks, writing each one as it arrives
         for _ in range(0, int(RATE / CHUNK * duration)):
-            data = stream.read(CHUNK)
-            frames.append(data)
+            wf.writeframes(stream.read(CHUNK, exception_on_overflow=False))
 
     except OSError as e:
+        # Discard the partial recording
+        wf.close()
+        temp_file.unlink(missing_ok=True)
         raise RuntimeError(
             f"Microphone access failed. Check:\n"
             f"  1. Microphone is connected\n"
@@ -100,23 +159,13 @@ def _record_audio(duration: int = 5) -> Path:
             f"Error: {e}"
         ) from e
     finally:
-        # Always clean up PyAudio resources
+        # Always clean up PyAudio resources and finalize the WAV header
         if stream is not None:
             stream.stop_stream()
             stream.close()
         if audio is not None:
             audio.terminate()
-
-    # Write to temporary WAV file
-    temp_file = Path(tempfile.mktemp(suffix=".wav"))
-    try:
-        with wave.open(str(temp_file), "wb") as wf:
-            wf.setnchannels(CHANNELS)
-            wf.setsampwidth(audio.get_sample_size(FORMAT))
-            wf.setframerate(RATE)
-            wf.writeframes(b"".join(frames))
-    except OSError as e:
-        raise OSError(f"Failed to write audio file: {e}") from e
+        wf.close()
 
     return temp_file
 
@@ -124,103 +173,124 @@ def _record_audio(duration: int = 5) -> Path:
 def _play_audio(audio_file: Path) -> None:
     """Play audio file through system speakers.
 
-    Loads audio using pydub (supports MP3, WAV, OGG, etc.) and plays via
-    simpleaudio. Requires ffmpeg for non-WAV formats. Blocks until complete.
+    Decodes audio in-process with miniaudio (MP3, WAV, FLAC, Vorbis; no
+    ffmpeg subprocess) and plays it via sounddevice. Blocks until complete.
 
     Code Flow:
     1. Verify audio file exists
-    2. Load audio file with pydub (auto-detects format, uses ffmpeg)
-    3. Convert to raw PCM and play through simpleaudio
+    2. Decode audio file with miniaudio to 16-bit PCM (auto-detects format)
+    3. Play the samples through sounddevice
     4. Block until playback completes
 
     Args:
-        audio_file: Path to audio file (MP3, WAV, OGG, etc.)
+        audio_file: Path to audio file (MP3, WAV, FLAC, Vorbis)
 
     Returns:
         None (blocks until playback finishes)
 
     Raises:
-        ImportError: If pydub or simpleaudio not installed (see INSTALL.md)
+        ImportError: If miniaudio or sounddevice not installed (see INSTALL.md)
         FileNotFoundError: If audio_file does not exist
         RuntimeError: If playback fails or format unsupported
     """
-    try:
-        from pydub import AudioSegment
-    except ImportError as e:
+    if _miniaudio is None:
         raise ImportError(
-            "pydub not installed. Install with:\n"
-            "  pip install pydub\n"
-            "  Also install ffmpeg:\n"
-            "    macOS: brew install ffmpeg\n"
-            "    Linux: sudo apt install ffmpeg\n"
-            "    Windows: Download from https://ffmpeg.org/"
-        ) from e
+            "miniaudio not installed. Install with:\n" "  pip install miniaudio"
+        )
 
-    try:
-        import simpleaudio as sa
-    except ImportError as e:
+    if _sd is None:
         raise ImportError(
-            "simpleaudio not installed. Install with:\n" "  pip install simpleaudio"
-        ) from e
+            "sounddevice not installed. Install with:\n"
+            "  pip install sounddevice\n"
+            "  Also install PortAudio:\n"
+            "    macOS: brew install portaudio\n"
+            "    Linux: sudo apt install libportaudio2"
+        )
 
     if not audio_file.exists():
         raise FileNotFoundError(f"Audio file not found: {audio_file}")
 
     try:
-        # Load audio (ffmpeg handles format conversion)
-        audio = AudioSegment.from_file(audio_file)
-
-        # Play audio through default output device
-        playback = sa.play_buffer(
-            audio.raw_data,
-            num_channels=audio.channels,
-            bytes_per_sample=audio.sample_width,
-            sample_rate=audio.frame_rate,
+        # Decode to interleaved 16-bit samples at the file's native channel
+        # count and rate (C decoder, no ffmpeg, no resampling)
+        info = _miniaudio.get_file_info(str(audio_file))
+        decoded = _miniaudio.decode_file(
+            str(audio_file),
+            output_format=_miniaudio.SampleFormat.SIGNED16,
+            nchannels=info.nchannels,
+            sample_rate=info.sample_rate,
+        )
+        samples = np.frombuffer(decoded.samples, dtype=np.int16).reshape(
+            -1, decoded.nchannels
         )
 
-        # Block until playback completes
-        playback.wait_done()
+        # Play audio through default output device and block until done
+        _sd.play(samples, decoded.sample_rate)
+        _sd.wait()
 
     except Exception as e:
         raise RuntimeError(
             f"Audio playback failed. Check:\n"
-            f"  1. Audio format supported\n"
-            f"  2. ffmpeg installed (for non-WAV)\n"
-            f"  3. Audio device available\n"
+            f"  1. Audio format supported (MP3, WAV, FLAC, Vorbis)\n"
+            f"  2. Audio device available\n"
             f"Error: {e}"
         ) from e
 
 
 # Shared chat logic for text and voice interfaces
-def _build_system_prompt() -> str:
+def _build_system_prompt(
+    data_loader: Callable[[], Optional[Dict[str, Any]]] = load_cached_data,
+) -> str:
     """Build system prompt with factory context and tool definitions.
 
     Loads production data and constructs a complete system prompt for Claude
     with date range, available machines, and instructions for answering questions.
 
     Code Flow:
-    1. Load production data from JSON via load_data()
-    2. Extract start_date and end_date, strip time component (keep YYYY-MM-DD)
-    3. Build comma-separated list of machine names from MACHINES constant
-    4. Construct system prompt with:
-       - Factory name and assistant role
-       - Available data range (30 days)
-       - Machine and shift information
-       - Instructions for tool usage and response formatting
-       - Current date context for relative date queries
+    1. Load production data via data_loader (default load_cached_data(): no
+       file I/O unless the data file changed since the last load)
+    2. Extract start_date and end_date as the YYYY-MM-DD prefix of each timestamp
+    3. Format the prompt via _format_system_prompt(), cached per
+       (start_date, end_date, today) so repeat calls reuse the same string
+
+    Args:
+        data_loader: Function returning the production data (for tests)
 
     Returns:
         Complete system prompt string with factory context and guidelines
     """
-    data = load_data()
-    start_date = data["start_date"].split("T")[0]
-    end_date = data["end_date"].split("T")[0]
-    machines = ", ".join([m["name"] for m in MACHINES])
+    data = data_loader()
+    # ISO timestamps: the first 10 characters are the date
+    start_date = data["start_date"][:10]
+    end_date = data["end_date"][:10]
+    today = datetime.now().strftime("%Y-%m-%d")
+
+    return _format_system_prompt(start_date, end_date, today)
+
+
+@functools.lru_cache(maxsize=1)
+def _format_system_prompt(start_date: str, end_date: str, today: str) -> str:
+    """Format the system prompt for a data range and current date.
+
+    Constructs the system prompt with:
+    - Factory name and assistant role
+    - Available data range (30 days)
+    - Machine and shift information
+    - Instructions for tool usage and response formatting
+    - Current date context for relative date queries
+
+    Args:
+        start_date: First day of production data (YYYY-MM-DD)
+        end_date: Last day of production data (YYYY-MM-DD)
+        today: Current date (YYYY-MM-DD)
 
+    Returns:
+        Complete system prompt string with factory context and guidelines
+    """
     return f"""You are a factory operations assistant for {FACTORY_NAME}.
 
 You have access to 30 days of production data ({start_date} to {end_date}) covering:
-- 4 machines: {machines}
+- 4 machines: {_MACHINE_NAMES}
 - 2 shifts: Day (6am-2pm) and Night (2pm-10pm)
 - Metrics: OEE, scrap, quality issues, downtime
 
@@ -231,16 +301,188 @@ When answering:
 4. Compare metrics when relevant
 5. Be concise but thorough
 
-Today's date is {datetime.now().strftime('%Y-%m-%d')}. When users ask about \
+Today's date is {today}. When users ask about \
 "today", "this week", or relative dates, calculate the appropriate date range \
 based on the data available."""
 
 
-def _get_chat_response(
-    client: OpenAI,
+# Rolling conversation window: once history exceeds the limit, keep only the
+# most recent turns (the system prompt is sent separately and never trimmed)
+MAX_HISTORY_MESSAGES = 40
+HISTORY_WINDOW = 30
+# Tool-calling rounds per turn before the model is made to answer
+MAX_TOOL_ITERATIONS = 6
+# Final answer when Claude still requests tools after they were disabled
+TOOL_LIMIT_ANSWER = (
+    "I couldn't finish looking this up within the tool call limit. "
+    "Try a narrower question (one machine or a shorter date range)."
+)
+# Appended to an answer that hit the MAX_TOKENS limit before finishing
+TRUNCATION_NOTICE = (
+    f"\n\n[Answer cut off at the {MAX_TOKENS}-token limit. Ask about fewer "
+    "machines or dates, or raise MAX_TOKENS.]"
+)
+
+
+def _trim_history(conversation_history: List[Dict[str, Any]]) -> None:
+    """Trim conversation history in place to a rolling window.
+
+    Keeps roughly the last HISTORY_WINDOW messages once the history grows past
+    MAX_HISTORY_MESSAGES. The cut is moved forward to the next user message so
+    the window never starts with an orphaned tool result or assistant reply,
+    but never past the latest user message: a single turn longer than the
+    window (many tool rounds) is kept whole.
+
+    Args:
+        conversation_history: History list as maintained by the chat loop
+    """
+    if len(conversation_history) <= MAX_HISTORY_MESSAGES:
+        return
+
+    # Start of the latest turn; nothing from here on is ever dropped
+    last_user = len(conversation_history) - 1
+    while last_user > 0 and conversation_history[last_user]["role"] != "user":
+        last_user -= 1
+
+    cut = len(conversation_history) - HISTORY_WINDOW
+    while cut < last_user and conversation_history[cut]["role"] != "user":
+        cut += 1
+    del conversation_history[: min(cut, last_user)]
+
+
+# Anthropic prompt caching (passed through by OpenRouter): the system prompt
+# and tool schema are identical on every call, so they are marked as a
+# cacheable prefix instead of being re-prefilled on each tool-loop iteration.
+# The markup is Anthropic-specific and only sent to anthropic/ models
+PROMPT_CACHE_CONTROL: Dict[str, str] = {"type": "ephemeral"}
+PROMPT_CACHING_HEADERS: Dict[str, str] = {"anthropic-beta": "prompt-caching-2024-07-31"}
+
+
+def _uses_prompt_caching(model: str) -> bool:
+    """Whether requests to model get the Anthropic prompt caching markup."""
+    return model.startswith("anthropic/")
+
+
+def _system_message(system_prompt: str, model: str) -> Dict[str, Any]:
+    """Build the system message, as a cacheable content block for Anthropic models."""
+    if not _uses_prompt_caching(model):
+        return {"role": "system", "content": system_prompt}
+    return {
+        "role": "system",
+        "content": [
+            {
+                "type": "text",
+                "text": system_prompt,
+                "cache_control": PROMPT_CACHE_CONTROL,
+            }
+        ],
+    }
+
+
+# Anything that may need factory data: metrics, time words, digits, machines
+_DATA_QUESTION = re.compile(
+    r"\d|oee|scrap|quality|defect|downtime|uptime|availab|perform|produc|"
+    r"parts?\b|rate|shift|machine|day|week|month|year|date|trend|compar|"
+    r"worst|best|issue|event|"
+    + "|".join(re.escape(name.split("-")[0]) for name in MACHINE_NAMES),
+    re.IGNORECASE,
+)
+
+
+def _route_model(user_message: str, conversation_history: List[Dict[str, Any]]) -> str:
+    """Pick MODEL for data questions and ROUTER_MODEL (if set) for the rest.
+
+    Once the history holds tool calls, every turn stays on MODEL: follow-ups
+    such as "why?" depend on that tool context, and ROUTER_MODEL is called
+    without tools. The history is bounded by _trim_history(), so the scan is
+    short.
+    """
+    if not ROUTER_MODEL or _DATA_QUESTION.search(user_message):
+        return MODEL
+    if any(
+        message["role"] == "tool" or message.get("tool_calls")
+        for message in conversation_history
+    ):
+        return MODEL
+    return ROUTER_MODEL
+
+
+async def _stream_completion(
+    client: "AsyncOpenAI",
+    messages: List[Dict[str, Any]],
+    on_token: Callable[[str], None],
+    **request: Any,
+) -> Tuple["ChatCompletionMessage", Optional[str]]:
+    """Stream one completion and rebuild the full assistant message.
+
+    Text deltas are passed to on_token as they arrive. Tool call deltas arrive
+    fragmented, so they are accumulated by tool call index (id and name once,
+    arguments concatenated) until the stream ends.
+
+    Args:
+        client: AsyncOpenAI client configured for OpenRouter
+        messages: Full message list to send
+        on_token: Callback for each text delta
+        **request: Model, limits, tools and tool_choice for the API call
+
+    Returns:
+        Tuple of (message, finish_reason): the assistant message equivalent
+        to a non-streamed response, and the finish reason of the last chunk
+        that carried one
+    """
+    stream = await client.chat.completions.create(
+        messages=messages, stream=True, **request
+    )
+
+    content_parts: List[str] = []
+    tool_calls: Dict[int, Dict[str, Any]] = {}
+    finish_reason: Optional[str] = None
+    async for chunk in stream:
+        if not chunk.choices:
+            continue
+        choice = chunk.choices[0]
+        finish_reason = choice.finish_reason or finish_reason
+        delta = choice.delta
+
+        if delta.content:
+            content_parts.append(delta.content)
+            on_token(delta.content)
+
+        for tool_delta in delta.tool_calls or []:
+            call = tool_calls.setdefault(
+                tool_delta.index,
+                {
+                    "id": None,
+                    "type": "function",
+                    "function": {"name": "", "arguments": ""},
+                },
+            )
+            if tool_delta.id:
+                call["id"] = tool_delta.id
+            if tool_delta.function is not None:
+                call["function"]["name"] += tool_delta.function.name or ""
+                call["function"]["arguments"] += tool_delta.function.arguments or ""
+
+    from openai.types.chat import ChatCompletionMessage
+
+    message = ChatCompletionMessage.model_validate(
+        {
+            "role": "assistant",
+            "content": "".join(content_parts) or None,
+            "tool_calls": [tool_calls[i] for i in sorted(tool_calls)] or None,
+        }
+    )
+    return message, finish_reason
+
+
+async def _get_chat_response(
+    client: "AsyncOpenAI",
     system_prompt: str,
     conversation_history: List[Dict[str, Any]],
     user_message: str,
+    cache: Optional[ResponseCache] = None,
+    on_token: Optional[Callable[[str], None]] = None,
+    execute_tool_fn: Optional[Callable[[str, Dict[str, Any]], Dict[str, Any]]] = None,
 ) -> Tuple[str, List[Dict[str, Any]]]:
     """Get Claude response with tool calling support.
 
@@ -250,45 +492,105 @@ def _get_chat_response(
 
     Code Flow:
     1. Build messages list: system prompt + conversation history + new user message
+       (for anthropic/ models the system prompt and tool schema are marked
+       for prompt caching)
+       If a cache is given and already holds this exact turn, return it with
+       no API calls. Messages with no data keywords, in a conversation with
+       no tool calls yet (see _route_model()), go to ROUTER_MODEL without
+       tools and are answered in one call
     2. Enter tool-calling loop:
-       a. Send messages to Claude API with tool definitions
+       a. Send messages to Claude API with tool definitions (streamed via
+          _stream_completion() when on_token is given)
        b. If Claude returns tool calls (not final answer):
           - Append assistant message with tool_calls to messages
-          - Execute each requested tool via execute_tool()
-          - Append tool results to messages
-          - Loop back to step 2a with updated messages
+          - Execute all requested tools concurrently via execute_tool(),
+            each in a worker thread so the event loop stays free (cached
+            results are reused for identical tool name + arguments)
+          - A tool + arguments pair already run this turn is not re-run;
+            it gets an error result telling Claude to use the earlier one
+          - Append tool results to messages in tool call order
+          - Loop back to step 2a with updated messages; after
+            MAX_TOOL_ITERATIONS rounds tools are disabled (tool_choice
+            "none") so the next reply is the final answer. If that reply
+            still has tool calls, they are not run and the turn ends with
+            its text (or TOOL_LIMIT_ANSWER), uncached
        c. If Claude returns text (no tool calls):
           - Extract final assistant response
           - Build updated history with all new messages (user + tool calls + assistant)
+          - If the answer stopped at MAX_TOKENS (finish_reason "length"),
+            append TRUNCATION_NOTICE to the response text (and stream it)
+            and skip the cache
+          - Otherwise store the turn in the cache, if given
           - Return response text and updated history
     3. Caller must update their conversation_history with returned history
 
     Args:
-        client: OpenAI client configured for OpenRouter
+        client: AsyncOpenAI client configured for OpenRouter
         system_prompt: System prompt with factory context
         conversation_history: List of previous conversation messages
         user_message: Current user message to process
+        cache: Optional exact-match cache for turns and tool results
+        on_token: Optional callback for streamed response text as it arrives
+        execute_tool_fn: Optional (tool_name, tool_args) -> result function
+            that runs tools (default: _run_tool(), i.e. execute_tool() or the
+            worker pool)
 
     Returns:
         Tuple of (response_text, updated_history):
         - response_text: Final assistant response text after all tool calls complete
         - updated_history: New messages to append (user msg, tool calls, assistant msg)
+
+    Raises:
+        CacheMiss: If the cache is in replay mode and has no entry for this turn
     """
+    # Turns that cannot need data go to the cheap model, without tools
+    model = _route_model(user_message, conversation_history)
+    prompt_caching = _uses_prompt_caching(model)
+
     # Build messages list with system prompt, history, and new message
-    messages = [{"role": "system", "content": system_prompt}]
+    messages = [_system_message(system_prompt, model)]
     messages.extend(conversation_history)
     messages.append({"role": "user", "content": user_message})
 
     # Track where new messages start (after existing history)
     history_start_index = len(messages) - 1  # Index of new user message
 
+    # Identical (model, prompt, history, question) turns are answered from cache
+    if cache is not None:
+        turn_key = cache.key("turn", model, messages)
+        cached = cache.get(turn_key)
+        if cached is not None:
+            return cached["response"], cached["history"]
+
     # Tool calling loop - continues until Claude provides final answer
+    seen_calls: set = set()
+    iterations = 0
     while True:
-        response = client.chat.completions.create(
-            model=MODEL, messages=messages, tools=TOOLS, tool_choice="auto"
-        )
-
-        message = response.choices[0].message
+        # Past the round limit Claude must answer with the results it has
+        tool_choice = "auto" if iterations < MAX_TOOL_ITERATIONS else "none"
+        iterations += 1
+
+        request: Dict[str, Any] = {
+            "model": model,
+            "max_tokens": MAX_TOKENS,
+            "stop": STOP_SEQUENCES,
+        }
+        if prompt_caching:
+            request["extra_headers"] = PROMPT_CACHING_HEADERS
+        if model == MODEL:
+            tools = _TOOLS_FROZEN if prompt_caching else _TOOLS_PLAIN
+            request.update(tools=tools, tool_choice=tool_choice)
+
+        if on_token is None:
+            response = await client.chat.completions.create(
+                messages=messages, **request
+            )
+            message = response.choices[0].message
+            finish_reason = response.choices[0].finish_reason
+        else:
+            message, finish_reason = await _stream_completion(
+                client, messages, on_token, **request
+            )
 
         # If no tool calls, we have the final answer
         if not message.tool_calls:
@@ -296,190 +598,328 @@ def _get_chat_response(
             new_history = messages[history_start_index:]
             # Add final assistant response
             new_history.append({"role": "assistant", "content": message.content})
+
+            # An answer cut off by max_tokens is flagged and never cached
+            if finish_reason == "length":
+                if on_token is not None:
+                    on_token(TRUNCATION_NOTICE)
+                return (message.content or "") + TRUNCATION_NOTICE, new_history
+
+            if cache is not None:
+                cache.set(
+                    turn_key, {"response": message.content, "history": new_history}
+                )
             return message.content, new_history
 
+        # Tool calls after tools were disabled (some providers ignore
+        # tool_choice) are not run; the turn ends with what Claude has said
+        if iterations > MAX_TOOL_ITERATIONS:
+            response_text = message.content or TOOL_LIMIT_ANSWER
+            new_history = messages[history_start_index:]
+            new_history.append({"role": "assistant", "content": response_text})
+            return response_text, new_history
+
         # Add assistant message with tool calls to history
-        messages.append(message.model_dump())
+        # Only fields the API actually set; skips the None-valued optional ones
+        messages.append(message.model_dump(exclude_none=True, exclude_unset=True))
 
-        # Execute each requested tool
+        # Repeats of a tool + arguments pair already run this turn are loops
+        calls = []
         for tool_call in message.tool_calls:
-            tool_name = tool_call.function.name
-            tool_args = json.loads(tool_call.function.arguments)
-
-            # Execute tool and get result
-            result = execute_tool(tool_name, tool_args)
+            name = tool_call.function.name
+            args = orjson.loads(tool_call.function.arguments)
+            call_key = (name, orjson.dumps(args, option=orjson.OPT_SORT_KEYS))
+            calls.append((name, args, call_key in seen_calls))
+            seen_calls.add(call_key)
+
+        # Execute requested tools concurrently, off the event loop
+        fresh = iter(
+            await asyncio.gather(
+                *(
+                    asyncio.to_thread(
+                        _execute_cached_tool, cache, name, args, execute_tool_fn
+                    )
+                    for name, args, repeated in calls
+                    if not repeated
+                )
+            )
+        )
 
-            # Add tool result to messages
+        # Add tool results to messages in request order
+        for tool_call, (name, _, repeated) in zip(message.tool_calls, calls):
+            if repeated:
+                result = {
+                    "error": f"Repeated call to {name} with the same arguments; "
+                    "use the earlier result"
+                }
+            else:
+                result = next(fresh)
             messages.append(
                 {
                     "role": "tool",
                     "tool_call_id": tool_call.id,
-                    "name": tool_name,
-                    "content": json.dumps(result),
+                    "name": name,
+                    "content": orjson.dumps(result).decode(),
                 }
             )
 
 
 # Tool definitions for Claude
-TOOLS = [
-    {
+# Parameters shared by every tool; the names and date format carry the
+# meaning (machines are listed in the system prompt), so descriptions stay short
+_DATE_RANGE_PROPERTIES: Dict[str, Any] = {
+    "start_date": {"type": "string", "format": "date"},
+    "end_date": {"type": "string", "format": "date"},
+    "machine_name": {"type": "string", "description": "Optional filter"},
+}
+
+
+def _tool_schema(
+    name: str, description: str, extra: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """Build a function tool taking the shared date range parameters."""
+    return {
         "type": "function",
         "function": {
-            "name": "calculate_oee",
-            "description": (
-                "Calculate Overall Equipment Effectiveness (OEE) for a "
-                "date range. Returns OEE percentage and breakdown."
-            ),
+            "name": name,
+            "description": description,
             "parameters": {
                 "type": "object",
-                "properties": {
-                    "start_date": {
-                        "type": "string",
-                        "description": "Start date (YYYY-MM-DD)",
-                    },
-                    "end_date": {
-                        "type": "string",
-                        "description": "End date (YYYY-MM-DD)",
-                    },
-                    "machine_name": {
-                        "type": "string",
-                        "description": "Optional machine name filter",
-                    },
-                },
+                "properties": {**_DATE_RANGE_PROPERTIES, **(extra or {})},
                 "required": ["start_date", "end_date"],
             },
         },
-    },
-    {
-        "type": "function",
-        "function": {
-            "name": "get_scrap_metrics",
-            "description": (
-                "Get scrap production metrics including total scrap, "
-                "scrap rate, and breakdown by machine."
-            ),
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "start_date": {
-                        "type": "string",
-                        "description": "Start date (YYYY-MM-DD)",
-                    },
-                    "end_date": {
-                        "type": "string",
-                        "description": "End date (YYYY-MM-DD)",
-                    },
-                    "machine_name": {
-                        "type": "string",
-                        "description": "Optional machine name filter",
-                    },
-                },
-                "required": ["start_date", "end_date"],
-            },
-        },
-    },
-    {
-        "type": "function",
-        "function": {
-            "name": "get_quality_issues",
-            "description": (
-                "Get quality defect events with details about defect types, "
-                "severity, and affected parts."
-            ),
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "start_date": {
-                        "type": "string",
-                        "description": "Start date (YYYY-MM-DD)",
-                    },
-                    "end_date": {
-                        "type": "string",
-                        "description": "End date (YYYY-MM-DD)",
-                    },
-                    "severity": {
-                        "type": "string",
-                        "description": "Optional severity filter: Low, Medium, or High",
-                    },
-                    "machine_name": {
-                        "type": "string",
-                        "description": "Optional machine name filter",
-                    },
-                },
-                "required": ["start_date", "end_date"],
-            },
-        },
-    },
-    {
-        "type": "function",
-        "function": {
-            "name": "get_downtime_analysis",
-            "description": (
-                "Analyze downtime events including reasons, duration, "
-                "and major incidents."
-            ),
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "start_date": {
-                        "type": "string",
-                        "description": "Start date (YYYY-MM-DD)",
-                    },
-                    "end_date": {
-                        "type": "string",
-                        "description": "End date (YYYY-MM-DD)",
-                    },
-                    "machine_name": {
-                        "type": "string",
-                        "description": "Optional machine name filter",
-                    },
-                },
-                "required": ["start_date", "end_date"],
-            },
-        },
-    },
-]
+    }
 
 
-def execute_tool(tool_name: str, tool_args: Dict[str, Any]) -> Dict[str, Any]:
+TOOLS = [
+    _tool_schema(
+        "calculate_oee", "OEE with availability/performance/quality breakdown."
+    ),
+    _tool_schema(
+        "get_scrap_metrics", "Scrap totals, scrap rate, and scrap by machine."
+    ),
+    _tool_schema(
+        "get_quality_issues",
+        "Quality defect events: type, severity, parts affected.",
+        {"severity": {"type": "string", "enum": ["Low", "Medium", "High"]}},
+    ),
+    _tool_schema("get_downtime_analysis", "Downtime by reason and major (>2h) events."),
+]
+
+# Frozen once at import; every completion call passes one of these objects.
+# For Anthropic models the last tool carries a cache breakpoint so the whole
+# tool schema is cached; other models get the schema unmarked
+_TOOLS_FROZEN = (*TOOLS[:-1], {**TOOLS[-1], "cache_control": PROMPT_CACHE_CONTROL})
+_TOOLS_PLAIN = tuple(TOOLS)
+
+# Tool name -> metric function, one lookup per tool call
+_TOOL_DISPATCH: Dict[str, Callable[..., Dict[str, Any]]] = {
+    "calculate_oee": calculate_oee,
+    "get_scrap_metrics": get_scrap_metrics,
+    "get_quality_issues": get_quality_issues,
+    "get_downtime_analysis": get_downtime_analysis,
+}
+
+
+def execute_tool(
+    tool_name: str,
+    tool_args: Dict[str, Any],
+    dispatch: Optional[Dict[str, Callable[..., Dict[str, Any]]]] = None,
+) -> Dict[str, Any]:
     """
     Execute a tool function and return results.
 
-    Maps tool names to their corresponding metric functions and executes them
-    with the provided arguments.
+    Looks up the metric function for the tool name in _TOOL_DISPATCH (or the
+    given dispatch table) and executes it with the provided arguments.
 
     Args:
         tool_name: Name of the tool to execute
         tool_args: Dictionary of arguments to pass to the tool
+        dispatch: Optional tool name -> function table (default: _TOOL_DISPATCH)
 
     Returns:
         Dictionary containing tool execution results or error message
     """
-    if tool_name == "calculate_oee":
-        return calculate_oee(**tool_args)
-    elif tool_name == "get_scrap_metrics":
-        return get_scrap_metrics(**tool_args)
-    elif tool_name == "get_quality_issues":
-        return get_quality_issues(**tool_args)
-    elif tool_name == "get_downtime_analysis":
-        return get_downtime_analysis(**tool_args)
-    else:
+    fn = (_TOOL_DISPATCH if dispatch is None else dispatch).get(tool_name)
+    if fn is None:
         return {"error": f"Unknown tool: {tool_name}"}
+    return fn(**tool_args)
+
+
+# Datasets at least this many days long run tools in worker processes;
+# smaller ones finish faster in-process than the IPC round trip
+PROCESS_POOL_MIN_DAYS = 365
+
+# Worker processes for tool calls, set for the chat session when in use
+_tool_pool: Optional[ProcessPoolExecutor] = None
+
+
+def _start_tool_pool() -> ProcessPoolExecutor:
+    """Start worker processes that each load the metrics data once.
+
+    Returns:
+        ProcessPoolExecutor sized for the tools Claude calls in one turn
+        Caller must shut it down when the session ends
+    """
+    return ProcessPoolExecutor(
+        max_workers=min(len(_TOOL_DISPATCH), os.cpu_count() or 1),
+        initializer=load_metric_arrays,
+    )
+
+
+def _run_tool(tool_name: str, tool_args: Dict[str, Any]) -> Dict[str, Any]:
+    """Execute a tool in the worker pool when one is running, else in-process.
+
+    Only the tool arguments and result dict cross the process boundary; each
+    worker reads the data itself.
+    """
+    fn = _TOOL_DISPATCH.get(tool_name)
+    if _tool_pool is None or fn is None:
+        return execute_tool(tool_name, tool_args)
+    return _tool_pool.submit(fn, **tool_args).result()
+
+
+# Tool results for this process, keyed on (tool name, sorted JSON arguments).
+# Tools are deterministic for a given data file, so the entries belong to one
+# data file version and are dropped when the file changes
+_TOOL_CACHE: Dict[Tuple[str, bytes], Dict[str, Any]] = {}
+_tool_cache_version: Optional[int] = None
+
+
+def _session_tool_cache() -> Dict[Tuple[str, bytes], Dict[str, Any]]:
+    """Return _TOOL_CACHE, emptied first if the data file changed since last use."""
+    global _tool_cache_version
+
+    path = get_data_path()
+    version = path.stat().st_mtime_ns if path.exists() else None
+    if version != _tool_cache_version:
+        _TOOL_CACHE.clear()
+        _tool_cache_version = version
+    return _TOOL_CACHE
+
+
+def _execute_cached_tool(
+    cache: Optional[ResponseCache],
+    tool_name: str,
+    tool_args: Dict[str, Any],
+    run: Optional[Callable[[str, Dict[str, Any]], Dict[str, Any]]] = None,
+) -> Dict[str, Any]:
+    """Execute a tool via run (default: _run_tool()), reusing a cached result.
+
+    Checks the in-memory session cache first, then the response cache (if
+    given), and only then runs the tool. With caching off (cache mode "off")
+    neither is used and the tool always runs.
+    """
+    if run is None:
+        run = _run_tool
+
+    if cache is not None and cache.mode == "off":
+        return run(tool_name, tool_args)
+
+    session = _session_tool_cache()
+    session_key = (tool_name, orjson.dumps(tool_args, option=orjson.OPT_SORT_KEYS))
+    result = session.get(session_key)
+    if result is not None:
+        return result
+
+    if cache is None:
+        result = run(tool_name, tool_args)
+    else:
+        key = cache.key("tool", tool_name, tool_args)
+        result = cache.get(key)
+        if result is None:
+            result = run(tool_name, tool_args)
+            cache.set(key, result)
+
+    session[session_key] = result
+    return result
 
 
 @app.command()
-def setup() -> None:
+def setup(
+    pretty: bool = typer.Option(
+        False, "--pretty", help="Write indented, human-readable JSON."
+    ),
+) -> None:
     """Initialize database with synthetic data."""
     console.print(Panel.fit("🏭 Factory Operations Data Generation", style="bold blue"))
 
-    initialize_data(days=30)
+    initialize_data(days=30, pretty=pretty)
 
     console.print("\n✅ Setup complete! Run 'chat' to start.\n", style="bold green")
 
 
+def _build_http_client() -> "httpx.AsyncClient":
+    """Build the HTTP client shared by every API call in a chat session.
+
+    Keeps TCP/TLS connections alive across the tool-calling loop and allows
+    HTTP/2 multiplexing, so follow-up completion calls reuse a warm
+    connection instead of opening a new one.
+
+    Returns:
+        httpx.AsyncClient with OpenAI SDK defaults plus tuned pool limits
+        Caller must close it (AsyncOpenAI.close() does this)
+    """
+    # Imported here; only the chat command makes HTTP calls
+    import httpx
+    from openai import DefaultAsyncHttpxClient
+
+    return DefaultAsyncHttpxClient(
+        limits=httpx.Limits(max_connections=100, max_keepalive_connections=50),
+        http2=True,
+        timeout=httpx.Timeout(60.0, connect=5.0),
+    )
+
+
 @app.command()
-def chat() -> None:
+def chat(
+    no_cache: bool = typer.Option(
+        False, "--no-cache", help="Always call the model and tools."
+    ),
+    replay: bool = typer.Option(
+        False, "--replay", help="Only answer from cache (reproducible demos)."
+    ),
+) -> None:
     """Start interactive factory operations chatbot."""
+    cache_mode = "off" if no_cache else "replay" if replay else "on"
+    _run_async(_chat_async, cache_mode)
+
+
+def _run_async(async_fn: Callable[..., Any], *args: Any) -> Any:
+    """Run an async command body to completion from a sync Typer command.
+
+    Uses anyio's asyncio backend, on uvloop when it is installed (Linux/macOS)
+    for faster socket dispatch under concurrent tool calls.
+
+    Args:
+        async_fn: Coroutine function to run
+        *args: Positional arguments for async_fn
+
+    Returns:
+        Whatever async_fn returns
+    """
+    import anyio
+
+    try:
+        import uvloop  # noqa: F401
+    except ImportError:
+        backend_options: Dict[str, Any] = {}
+    else:
+        backend_options = {"use_uvloop": True}
+
+    return anyio.run(
+        async_fn, *args, backend="asyncio", backend_options=backend_options
+    )
+
+
+async def _chat_async(cache_mode: str = "on") -> None:
+    """Run the interactive chat session on an event loop.
+
+    Args:
+        cache_mode: Response cache policy, one of "on", "off", or "replay"
+    """
+    global _tool_pool
 
     # Validate API key
     if not API_KEY:
@@ -494,11 +934,14 @@ def chat() -> None:
         console.print("❌ Data not found. Please run 'setup' first.", style="bold red")
         raise typer.Exit(1)
 
-    # Build system prompt and get date range for display
+    # Load data once for the date range; the system prompt and the metric
+    # functions share this parse and the grids warmed here, so tool calls
+    # never go back to disk while the data file is unchanged
+    data = load_cached_data()
+    load_metric_arrays()
+    start_date = data["start_date"][:10]
+    end_date = data["end_date"][:10]
     system_prompt = _build_system_prompt()
-    data = load_data()
-    start_date = data["start_date"].split("T")[0]
-    end_date = data["end_date"].split("T")[0]
 
     # Display welcome panel
     console.print(
@@ -511,43 +954,101 @@ def chat() -> None:
         )
     )
 
-    # Initialize OpenAI client (works with OpenRouter)
-    client = OpenAI(base_url="https://openrouter.ai/api/v1", api_key=API_KEY)
+    from openai import AsyncOpenAI
 
-    # Conversation history
-    conversation_history: List[Dict[str, Any]] = []
+    # Session resources; created inside the try so a failure part-way through
+    # setup still releases whatever was already opened
+    client: Optional[AsyncOpenAI] = None
+    cache: Optional[ResponseCache] = None
 
-    # Main chat loop
-    while True:
-        # Get user input
-        try:
-            question = console.input("\n[bold green]You:[/bold green] ")
-        except (KeyboardInterrupt, EOFError):
-            break
-
-        # Check for exit commands
-        if question.lower().strip() in ["exit", "quit", "q"]:
-            break
-
-        # Skip empty input
-        if not question.strip():
-            continue
-
-        try:
-            # Get response using shared chat logic
-            with console.status("[bold blue]Thinking...", spinner="dots"):
-                response_text, new_history = _get_chat_response(
-                    client, system_prompt, conversation_history, question
-                )
+    try:
+        # Initialize OpenAI client (works with OpenRouter) on a pooled HTTP client
+        client = AsyncOpenAI(
+            base_url="https://openrouter.ai/api/v1",
+            api_key=API_KEY,
+            http_client=_build_http_client(),
+        )
 
-            # Display assistant response
-            console.print(f"\n[bold blue]Assistant:[/bold blue] {response_text}")
+        # Large datasets get worker processes for true parallel tool calls
+        if len(data["production"]) >= PROCESS_POOL_MIN_DAYS:
+            _tool_pool = _start_tool_pool()
 
-            # Update conversation history with all new messages (includes tool calls)
-            conversation_history.extend(new_history)
+        # Cache entries are tied to the current data file; regenerating drops them
+        cache = ResponseCache(
+            CACHE_FILE,
+            mode=cache_mode,
+            namespace=str(get_data_path().stat().st_mtime_ns),
+        )
 
-        except Exception as e:
-            console.print(f"\n[bold red]Error:[/bold red] {str(e)}")
+        # Conversation history
+        conversation_history: List[Dict[str, Any]] = []
+
+        # Main chat loop
+        while True:
+            # Get user input
+            try:
+                question = console.input("\n[bold green]You:[/bold green] ")
+            except (KeyboardInterrupt, EOFError):
+                break
+
+            # Check for exit commands
+            if question.lower().strip() in ["exit", "quit", "q"]:
+                break
+
+            # Skip empty input
+            if not question.strip():
+                continue
+
+            # Spinner runs until the first streamed token arrives
+            status = console.status("[bold blue]Thinking...", spinner="dots")
+            streamed: List[str] = []
+
+            def on_token(delta: str) -> None:
+                """Print a streamed text delta, replacing the spinner on the first."""
+                if not streamed:
+                    status.stop()
+                    console.print("\n[bold blue]Assistant:[/bold blue] ", end="")
+                streamed.append(delta)
+                console.print(delta, end="", markup=False, highlight=False)
+
+            try:
+                # Get response using shared chat logic
+                status.start()
+                try:
+                    response_text, new_history = await _get_chat_response(
+                        client,
+                        system_prompt,
+                        conversation_history,
+                        question,
+                        cache,
+                        on_token,
+                    )
+                finally:
+                    status.stop()
+
+                # Display assistant response (already shown if it was streamed)
+                if streamed:
+                    console.print()
+                else:
+                    console.print(
+                        f"\n[bold blue]Assistant:[/bold blue] {response_text}"
+                    )
+
+                # Update conversation history with all new messages (includes tool calls)
+                conversation_history.extend(new_history)
+                _trim_history(conversation_history)
+
+            except Exception as e:
+                console.print(f"\n[bold red]Error:[/bold red] {str(e)}")
+    finally:
+        # Close pooled connections, the cache database, and tool workers
+        if client is not None:
+            await client.close()
+        if cache is not None:
+            cache.close()
+        if _tool_pool is not None:
+            _tool_pool.shutdown()
+            _tool_pool = None
 
     console.print("\n👋 Goodbye!\n", style="bold blue")
 
@@ -559,6 +1060,8 @@ def stats() -> None:
         console.print("❌ Data not found. Please run 'setup' first.", style="bold red")
         raise typer.Exit(1)
 
+    from rich.table import Table
+
     data = load_data()
 
     # Create statistics table
@@ -566,13 +1069,15 @@ def stats() -> None:
     table.add_column("Metric", style="cyan")
     table.add_column("Value", style="magenta")
 
-    table.add_row(
-        "Date Range",
-        f"{data['start_date'].split('T')[0]} to {data['end_date'].split('T')[0]}",
-    )
-    table.add_row("Days", str(len(data["production"])))
-    table.add_row("Machines", str(len(data["machines"])))
-    table.add_row("Shifts", str(len(data["shifts"])))
+    # Rows as (metric, value) pairs; add new statistics here
+    rows = [
+        ("Date Range", f"{data['start_date'][:10]} to {data['end_date'][:10]}"),
+        ("Days", str(len(data["production"]))),
+        ("Machines", str(len(data["machines"]))),
+        ("Shifts", str(len(data["shifts"]))),
+    ]
+    for metric, value in rows:
+        table.add_row(metric, value)
 
     console.print(table)
     console.print()
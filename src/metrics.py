@@ -1,28 +1,138 @@
 """Analysis and metrics calculation functions for factory production data."""
-from datetime import datetime, timedelta
-from typing import Dict, List, Any, Optional
-from .data import load_data, MACHINES
+from typing import Dict, Any, NamedTuple, Optional
+import pandas as pd
+from .data import (
+    EVENT_COLUMNS,
+    MetricArrays,
+    load_events,
+    load_metric_arrays,
+    MACHINES,
+)
+
+PLANNED_HOURS_PER_DAY = 16  # 2 shifts * 8 hours
+PERFORMANCE = 0.95  # Simplified - assume running at 95% of ideal when uptime
+
+# Output fields for each quality issue and major downtime event, taken from
+# the event table columns (issues list date and machine last)
+ISSUE_FIELDS = EVENT_COLUMNS["quality_issues"][2:]
+EVENT_FIELDS = EVENT_COLUMNS["downtime_events"]
+
+
+def _machine_columns(arrays: MetricArrays, machine_name: Optional[str]) -> Any:
+    """
+    Column selector for MetricArrays grids.
+
+    Args:
+        arrays: Arrays from load_metric_arrays()
+        machine_name: Optional machine name filter; None selects all machines
+
+    Returns:
+        A column index or slice (an empty slice if the machine has no data)
+    """
+    if not machine_name:
+        return slice(None)
+    m = arrays.machines.get(machine_name)
+    return slice(0, 0) if m is None else slice(m, m + 1)
 
 
-def get_date_range(start_date: str, end_date: str) -> List[str]:
+def _select_events(
+    df: pd.DataFrame, start_date: str, end_date: str, machine_name: Optional[str]
+) -> pd.DataFrame:
     """
-    Get list of dates in range.
+    Filter an event table to a date range and optional machine.
 
     Args:
+        df: Table from load_events()
         start_date: Start date in ISO format (YYYY-MM-DD)
         end_date: End date in ISO format (YYYY-MM-DD)
+        machine_name: Optional machine name filter
 
     Returns:
-        List of date strings in YYYY-MM-DD format
+        Matching rows, in their original order
+    """
+    dates = df['date']
+    mask = (dates >= start_date.split('T')[0]) & (dates <= end_date.split('T')[0])
+    if machine_name:
+        mask &= df['machine'] == machine_name
+    return df[mask]
+
+
+class RangeTotals(NamedTuple):
+    """Totals over one (date range, machine filter) selection of the grids."""
+    days: int  # Rows in the date range, for any machine
+    records: int  # (date, machine) records selected
+    parts: int
+    good: int
+    scrap: int
+    uptime: float
+    downtime: float
+
+
+def _range_totals(
+    arrays: MetricArrays, start_date: str, end_date: str, machine_name: Optional[str]
+) -> RangeTotals:
     """
-    start = datetime.fromisoformat(start_date.split('T')[0])
-    end = datetime.fromisoformat(end_date.split('T')[0])
-    dates = []
-    current = start
-    while current <= end:
-        dates.append(current.strftime("%Y-%m-%d"))
-        current += timedelta(days=1)
-    return dates
+    Sum every metric grid over a selection once, shared by the metric functions.
+
+    OEE, scrap and downtime tools asked about the same range in one turn
+    reuse a single set of reductions. Results are memoized on the arrays, so
+    they are dropped together when the data file changes.
+
+    Args:
+        arrays: Arrays from load_metric_arrays()
+        start_date: Start date in ISO format (YYYY-MM-DD)
+        end_date: End date in ISO format (YYYY-MM-DD)
+        machine_name: Optional machine name filter
+
+    Returns:
+        RangeTotals for the selection
+    """
+    days = arrays.date_slice(start_date, end_date)
+    key = (days.start, days.stop, machine_name or None)
+    totals = arrays.range_totals.get(key)
+    if totals is None:
+        cells = (days, _machine_columns(arrays, machine_name))
+        totals = arrays.range_totals[key] = RangeTotals(
+            days=days.stop - days.start,
+            records=int(arrays.present[cells].sum()),
+            parts=int(arrays.parts[cells].sum()),
+            good=int(arrays.good[cells].sum()),
+            scrap=int(arrays.scrap[cells].sum()),
+            uptime=float(arrays.uptime[cells].sum()),
+            downtime=float(arrays.downtime[cells].sum()),
+        )
+    return totals
+
+
+def _daily_sums(
+    arrays: MetricArrays,
+    start_date: str,
+    end_date: str,
+    machine_name: Optional[str],
+    *grids: str,
+) -> pd.DataFrame:
+    """
+    Per-day sums of metric grids over a selection, for the daily metric functions.
+
+    Args:
+        arrays: Arrays from load_metric_arrays()
+        start_date: Start date in ISO format (YYYY-MM-DD)
+        end_date: End date in ISO format (YYYY-MM-DD)
+        machine_name: Optional machine name filter
+        *grids: MetricArrays grid names to sum (e.g. "parts", "uptime")
+
+    Returns:
+        DataFrame indexed by date with a records column (records per day)
+        and one column per grid; days with no records are left out
+    """
+    days = arrays.date_slice(start_date, end_date)
+    cells = (days, _machine_columns(arrays, machine_name))
+    records = arrays.present[cells].sum(axis=1)
+    kept = records > 0
+    columns = {"records": records[kept]}
+    for grid in grids:
+        columns[grid] = getattr(arrays, grid)[cells].sum(axis=1)[kept]
+    return pd.DataFrame(columns, index=pd.Index(arrays.dates[days], name="date")[kept])
 
 
 def calculate_oee(
@@ -43,38 +153,20 @@ def calculate_oee(
     Returns:
         Dictionary containing OEE metrics and components
     """
-    data = load_data()
-    if not data:
+    arrays = load_metric_arrays()
+    if arrays is None:
         return {"error": "No data available"}
 
-    dates = get_date_range(start_date, end_date)
-
-    # Filter dates within data range
-    valid_dates = [d for d in dates if d in data['production']]
-    if not valid_dates:
+    # Reduce the (date, machine) grids instead of scanning every record
+    totals = _range_totals(arrays, start_date, end_date, machine_name)
+    if totals.days == 0:
         return {"error": "No data for specified date range"}
 
     # Aggregate metrics
-    total_parts = 0
-    total_good = 0
-    total_uptime = 0
-    total_planned_time = 0
-
-    for date in valid_dates:
-        day_data = data['production'][date]
-
-        # Filter by machine if specified
-        machines_to_process = [machine_name] if machine_name else day_data.keys()
-
-        for machine in machines_to_process:
-            if machine not in day_data:
-                continue
-
-            m_data = day_data[machine]
-            total_parts += m_data['parts_produced']
-            total_good += m_data['good_parts']
-            total_uptime += m_data['uptime_hours']
-            total_planned_time += 16  # 2 shifts * 8 hours
+    total_parts = totals.parts
+    total_good = totals.good
+    total_uptime = totals.uptime
+    total_planned_time = totals.records * PLANNED_HOURS_PER_DAY
 
     if total_planned_time == 0:
         return {"error": "No valid data found"}
@@ -83,8 +175,7 @@ def calculate_oee(
     availability = total_uptime / total_planned_time if total_planned_time > 0 else 0
     quality = total_good / total_parts if total_parts > 0 else 0
 
-    # Performance (simplified - assume running at 95% of ideal when uptime)
-    performance = 0.95
+    performance = PERFORMANCE
 
     oee = availability * performance * quality
 
@@ -115,34 +206,24 @@ def get_scrap_metrics(
     Returns:
         Dictionary containing scrap metrics
     """
-    data = load_data()
-    if not data:
+    arrays = load_metric_arrays()
+    if arrays is None:
         return {"error": "No data available"}
 
-    dates = get_date_range(start_date, end_date)
-    valid_dates = [d for d in dates if d in data['production']]
-
-    total_scrap = 0
-    total_parts = 0
+    totals = _range_totals(arrays, start_date, end_date, machine_name)
+    total_scrap = totals.scrap
+    total_parts = totals.parts
     scrap_by_machine = {}
-
-    for date in valid_dates:
-        day_data = data['production'][date]
-        machines_to_process = [machine_name] if machine_name else day_data.keys()
-
-        for machine in machines_to_process:
-            if machine not in day_data:
-                continue
-
-            m_data = day_data[machine]
-            scrap = m_data['scrap_parts']
-            parts = m_data['parts_produced']
-
-            total_scrap += scrap
-            total_parts += parts
-
-            if not machine_name:
-                scrap_by_machine[machine] = scrap_by_machine.get(machine, 0) + scrap
+    if not machine_name:
+        days = arrays.date_slice(start_date, end_date)
+        # Per-machine column sums; machines with no records in range are left out
+        by_machine = arrays.scrap[days].sum(axis=0)
+        seen = arrays.present[days].any(axis=0)
+        scrap_by_machine = {
+            machine: int(by_machine[m])
+            for machine, m in arrays.machines.items()
+            if seen[m]
+        }
 
     scrap_rate = (total_scrap / total_parts * 100) if total_parts > 0 else 0
 
@@ -176,42 +257,24 @@ def get_quality_issues(
     Returns:
         Dictionary containing quality issues and statistics
     """
-    data = load_data()
-    if not data:
+    df = load_events('quality_issues')
+    if df is None:
         return {"error": "No data available"}
 
-    dates = get_date_range(start_date, end_date)
-    valid_dates = [d for d in dates if d in data['production']]
-
-    issues = []
-    severity_breakdown = {}
-    total_parts_affected = 0
-
-    for date in valid_dates:
-        day_data = data['production'][date]
-        machines_to_process = [machine_name] if machine_name else day_data.keys()
+    rows = _select_events(df, start_date, end_date, machine_name)
+    # Filter by severity if specified
+    if severity:
+        rows = rows[rows['severity'] == severity]
 
-        for machine in machines_to_process:
-            if machine not in day_data:
-                continue
-
-            m_data = day_data[machine]
-            for issue in m_data.get('quality_issues', []):
-                # Filter by severity if specified
-                if severity and issue['severity'] != severity:
-                    continue
-
-                issues.append({**issue, "date": date, "machine": machine})
-
-                total_parts_affected += issue['parts_affected']
-                sev = issue['severity']
-                severity_breakdown[sev] = severity_breakdown.get(sev, 0) + 1
+    # Each issue's own fields, then where it happened
+    issues = rows[[*ISSUE_FIELDS, "date", "machine"]].to_dict("records")
+    severity_breakdown = rows['severity'].value_counts(sort=False)
 
     return {
         "issues": issues,
         "total_issues": len(issues),
-        "total_parts_affected": total_parts_affected,
-        "severity_breakdown": severity_breakdown
+        "total_parts_affected": int(rows['parts_affected'].sum()),
+        "severity_breakdown": {sev: int(n) for sev, n in severity_breakdown.items()}
     }
 
 
@@ -231,46 +294,104 @@ def get_downtime_analysis(
     Returns:
         Dictionary containing downtime analysis
     """
-    data = load_data()
-    if not data:
+    df = load_events('downtime_events')
+    arrays = load_metric_arrays()
+    if df is None or arrays is None:
         return {"error": "No data available"}
 
-    dates = get_date_range(start_date, end_date)
-    valid_dates = [d for d in dates if d in data['production']]
+    rows = _select_events(df, start_date, end_date, machine_name)
+    downtime_by_reason = rows.groupby('reason', sort=False)['duration_hours'].sum()
 
-    total_downtime = 0
-    downtime_by_reason = {}
-    major_events = []
+    # Track major events (> 2 hours)
+    major_events = rows.loc[rows['duration_hours'] > 2.0, EVENT_FIELDS].to_dict("records")
 
-    for date in valid_dates:
-        day_data = data['production'][date]
-        machines_to_process = [machine_name] if machine_name else day_data.keys()
+    # Totals come straight from the grids
+    total_downtime = _range_totals(arrays, start_date, end_date, machine_name).downtime
 
-        for machine in machines_to_process:
-            if machine not in day_data:
-                continue
+    return {
+        "total_downtime_hours": round(total_downtime, 2),
+        "downtime_by_reason": {k: round(float(v), 2) for k, v in downtime_by_reason.items()},
+        "major_events": major_events
+    }
 
-            m_data = day_data[machine]
-            total_downtime += m_data['downtime_hours']
 
-            for event in m_data.get('downtime_events', []):
-                reason = event['reason']
-                hours = event['duration_hours']
+def _round(values: pd.Series, ndigits: int) -> pd.Series:
+    """Round like the builtin round() so daily and range results agree."""
+    return values.map(lambda v: round(float(v), ndigits))
 
-                downtime_by_reason[reason] = downtime_by_reason.get(reason, 0) + hours
 
-                # Track major events (> 2 hours)
-                if hours > 2.0:
-                    major_events.append({
-                        "date": date,
-                        "machine": machine,
-                        "reason": reason,
-                        "description": event['description'],
-                        "duration_hours": hours
-                    })
+def calculate_oee_daily(
+    start_date: str,
+    end_date: str,
+    machine_name: Optional[str] = None
+) -> pd.DataFrame:
+    """
+    Calculate OEE for every day in a date range in a single pass.
 
-    return {
-        "total_downtime_hours": round(total_downtime, 2),
-        "downtime_by_reason": {k: round(v, 2) for k, v in downtime_by_reason.items()},
-        "major_events": major_events
-    }
+    Equivalent to calling calculate_oee() once per day, without re-scanning
+    the production data for each day.
+
+    Args:
+        start_date: Start date in ISO format (YYYY-MM-DD)
+        end_date: End date in ISO format (YYYY-MM-DD)
+        machine_name: Optional machine name filter
+
+    Returns:
+        DataFrame indexed by date with oee, availability, performance and
+        quality columns (empty if no data is available)
+    """
+    columns = ["oee", "availability", "performance", "quality"]
+    arrays = load_metric_arrays()
+    if arrays is None:
+        return pd.DataFrame(columns=columns, index=pd.Index([], name="date"))
+
+    # Row sums of the (date, machine) grids, one per day
+    daily = _daily_sums(
+        arrays, start_date, end_date, machine_name, "parts", "good", "uptime"
+    )
+
+    availability = daily["uptime"] / (daily["records"] * PLANNED_HOURS_PER_DAY)
+    quality = (daily["good"] / daily["parts"]).fillna(0)
+
+    return pd.DataFrame({
+        "oee": _round(availability * PERFORMANCE * quality, 3),
+        "availability": _round(availability, 3),
+        "performance": PERFORMANCE,
+        "quality": _round(quality, 3),
+    }, columns=columns)
+
+
+def get_scrap_metrics_daily(
+    start_date: str,
+    end_date: str,
+    machine_name: Optional[str] = None
+) -> pd.DataFrame:
+    """
+    Get scrap metrics for every day in a date range in a single pass.
+
+    Equivalent to calling get_scrap_metrics() once per day, without
+    re-scanning the production data for each day.
+
+    Args:
+        start_date: Start date in ISO format (YYYY-MM-DD)
+        end_date: End date in ISO format (YYYY-MM-DD)
+        machine_name: Optional machine name filter
+
+    Returns:
+        DataFrame indexed by date with total_scrap, total_parts and
+        scrap_rate columns (empty if no data is available)
+    """
+    columns = ["total_scrap", "total_parts", "scrap_rate"]
+    arrays = load_metric_arrays()
+    if arrays is None:
+        return pd.DataFrame(columns=columns, index=pd.Index([], name="date"))
+
+    # Row sums of the (date, machine) grids, one per day
+    daily = _daily_sums(
+        arrays, start_date, end_date, machine_name, "scrap", "parts"
+    ).rename(columns={"scrap": "total_scrap", "parts": "total_parts"})
+    daily["scrap_rate"] = _round(
+        (daily["total_scrap"] / daily["total_parts"] * 100).fillna(0), 2
+    )
+
+    return daily[columns]
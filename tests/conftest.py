@@ -0,0 +1,117 @@
+"""Shared fixtures for the test suite."""
+
+import json
+from functools import lru_cache
+from types import MappingProxyType, SimpleNamespace
+from typing import Any, Awaitable, Callable, Dict, Final, List, Optional
+from unittest.mock import create_autospec
+
+import pytest
+
+# Data file stand-in for system prompt tests; read-only so it can be shared
+FROZEN_DATES = MappingProxyType(
+    {"start_date": "2024-01-01T00:00:00", "end_date": "2024-01-30T23:59:59"}
+)
+
+# One earlier exchange, for follow-up tests; built once and read-only
+EXISTING_HISTORY: Final = (
+    MappingProxyType({"role": "user", "content": "Previous question"}),
+    MappingProxyType({"role": "assistant", "content": "Previous answer"}),
+)
+
+
+class _ClientShape:
+    """The slice of the AsyncOpenAI client that the chat code calls."""
+
+    class chat:
+        class completions:
+            @staticmethod
+            async def create(
+                *, model: str, messages: List[Dict[str, Any]], **kwargs: Any
+            ) -> Any:
+                """Create a chat completion; model and messages are required."""
+
+
+# Autospec is slow to build, so the client mock is built once at import
+_CLIENT_TEMPLATE = create_autospec(_ClientShape, spec_set=True, instance=True)
+
+
+@lru_cache(maxsize=64)
+def _cached_dumps(items: tuple[tuple[str, str], ...]) -> str:
+    """Serialize sorted argument items; each distinct payload is encoded once."""
+    return json.dumps(dict(items))
+
+
+def tool_args_json(**kwargs: str) -> str:
+    """JSON tool call arguments, serialized once per distinct set of arguments."""
+    return _cached_dumps(tuple(sorted(kwargs.items())))
+
+
+def fake_response(
+    content: Optional[str] = None,
+    tool_calls: Optional[List[Any]] = None,
+    model_dump: Optional[Dict[str, Any]] = None,
+    finish_reason: str = "stop",
+) -> SimpleNamespace:
+    """Build a non-streamed completion response with a single choice.
+
+    Plain namespaces are enough: the code under test only reads attributes.
+    model_dump, if given, is what message.model_dump() returns.
+    """
+    message = SimpleNamespace(content=content, tool_calls=tool_calls)
+    if model_dump is not None:
+        message.model_dump = lambda **_: model_dump
+    choice = SimpleNamespace(message=message, finish_reason=finish_reason)
+    return SimpleNamespace(choices=[choice])
+
+
+# Content-only responses; the code under test never mutates a response,
+# so every test shares these
+HELLO_RESPONSE: Final = fake_response(content="Hello!")
+FOLLOW_UP_RESPONSE: Final = fake_response(content="Response")
+
+
+def fake_tool_call(call_id: str, name: str, arguments: str) -> SimpleNamespace:
+    """Build one tool call as found in a response message's tool_calls."""
+    return SimpleNamespace(
+        id=call_id, function=SimpleNamespace(name=name, arguments=arguments)
+    )
+
+
+def scripted_create(*responses: Any) -> Callable[..., Awaitable[Any]]:
+    """An async completions.create stand-in that returns responses in order.
+
+    For tests that only need the next response: unlike side_effect, nothing
+    is recorded per call.
+    """
+    remaining = iter(responses)
+
+    async def create(**_: Any) -> Any:
+        return next(remaining)
+
+    return create
+
+
+@pytest.fixture(scope="session")
+def mainmod():
+    """The src.main module, imported once for the session.
+
+    Tests read symbols off the module and patch with patch.object, so no
+    dotted-path lookup happens per patch.
+    """
+    import src.main as m
+
+    return m
+
+
+@pytest.fixture
+def mock_client():
+    """Client whose completions.create returns HELLO_RESPONSE.
+
+    The shared spec_set client is reset first (recorded calls, return values
+    and side effects), so nothing leaks between tests, and a misspelled
+    attribute fails instead of silently creating a child mock.
+    """
+    _CLIENT_TEMPLATE.reset_mock(return_value=True, side_effect=True)
+    _CLIENT_TEMPLATE.chat.completions.create.return_value = HELLO_RESPONSE
+    return _CLIENT_TEMPLATE
@@ -0,0 +1,62 @@
+"""
+Smoke tests for the exact-match response cache.
+
+Tests ResponseCache across its three modes:
+- on: Values are stored and returned
+- off: Nothing is stored or returned
+- replay: Stored values are returned, misses raise CacheMiss
+"""
+
+import pytest
+
+from src.cache import CacheMiss, ResponseCache
+
+
+@pytest.fixture
+def cache_path(tmp_path):
+    """Path to a fresh cache database."""
+    return str(tmp_path / "cache.sqlite")
+
+
+class TestResponseCache:
+    """Smoke tests for ResponseCache."""
+
+    def test_round_trips_values(self, cache_path):
+        """Verify stored values come back unchanged."""
+        cache = ResponseCache(cache_path)
+        key = cache.key("tool", "calculate_oee", {"start_date": "2024-01-01"})
+
+        assert cache.get(key) is None
+        cache.set(key, {"oee": 0.85, "machines": ["CNC-001"]})
+        assert cache.get(key) == {"oee": 0.85, "machines": ["CNC-001"]}
+
+    def test_keys_depend_on_namespace_not_arg_order(self, cache_path):
+        """Verify keys ignore dict ordering but change with the namespace."""
+        cache = ResponseCache(cache_path, namespace="v1")
+
+        assert cache.key({"a": 1, "b": 2}) == cache.key({"b": 2, "a": 1})
+        assert cache.key({"a": 1}) != ResponseCache(cache_path, namespace="v2").key(
+            {"a": 1}
+        )
+
+    def test_off_mode_stores_nothing(self, cache_path):
+        """Verify the bypass mode never returns a value."""
+        cache = ResponseCache(cache_path, mode="off")
+        cache.set("key", {"oee": 0.85})
+
+        assert cache.get("key") is None
+
+    def test_replay_mode_is_read_only(self, cache_path):
+        """Verify replay serves stored values and raises on a miss."""
+        ResponseCache(cache_path).set("hit", {"oee": 0.85})
+        cache = ResponseCache(cache_path, mode="replay")
+        cache.set("miss", {"oee": 0.5})
+
+        assert cache.get("hit") == {"oee": 0.85}
+        with pytest.raises(CacheMiss):
+            cache.get("miss")
+
+    def test_rejects_unknown_mode(self, cache_path):
+        """Verify an unknown mode is an error."""
+        with pytest.raises(ValueError):
+            ResponseCache(cache_path, mode="sometimes")
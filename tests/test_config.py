@@ -28,12 +28,12 @@ def test_audio_dependencies_import():
     """Verify audio libraries can be imported."""
     try:
         import pyaudio
-        import pydub
-        import simpleaudio
+        import miniaudio
+        import sounddevice
 
         # If we get here, imports succeeded
         assert True
-    except ImportError as e:
+    except (ImportError, OSError) as e:
         pytest.fail(f"Failed to import audio library: {e}")
 
 
@@ -0,0 +1,128 @@
+"""Tests for data storage module."""
+
+from unittest.mock import patch
+
+import pytest
+
+from src.data import (
+    FRAME_COLUMNS,
+    generate_production_data,
+    invalidate_data_cache,
+    load_cached_data,
+    load_events,
+    load_frame,
+    load_metric_arrays,
+    save_data,
+)
+
+
+@pytest.fixture
+def data_path(tmp_path):
+    """Point the data module at a temporary data file."""
+    path = tmp_path / "production.json"
+    with patch("src.data.get_data_path", return_value=path):
+        yield path
+
+
+def test_load_frame_reads_selected_columns(data_path):
+    """Verify the columnar copy holds one row per (date, machine)."""
+    data = generate_production_data(days=3)
+    save_data(data)
+
+    assert data_path.with_suffix(".parquet").exists()
+    df = load_frame(columns=["date", "machine", "parts_produced"])
+
+    assert list(df.columns) == ["date", "machine", "parts_produced"]
+    assert len(df) == 3 * len(data["machines"])
+    first_date = df["date"].iloc[0]
+    first_machine = df["machine"].iloc[0]
+    expected = data["production"][first_date][first_machine]["parts_produced"]
+    assert df["parts_produced"].iloc[0] == expected
+
+
+def test_load_frame_falls_back_to_json(data_path):
+    """Verify load_frame() works when the columnar copy is missing."""
+    save_data(generate_production_data(days=2))
+    data_path.with_suffix(".parquet").unlink()
+
+    df = load_frame()
+
+    assert list(df.columns) == FRAME_COLUMNS
+    assert len(df) > 0
+
+
+def test_load_events_flattens_nested_items(data_path):
+    """Verify each quality issue gets a row, with or without the Parquet table."""
+    data = generate_production_data(days=20, seed=3)
+    save_data(data)
+    expected = sum(
+        len(m_data["quality_issues"])
+        for day_data in data["production"].values()
+        for m_data in day_data.values()
+    )
+
+    from_parquet = load_events("quality_issues")
+    data_path.with_name("production.quality_issues.parquet").unlink()
+    invalidate_data_cache()
+    from_json = load_events("quality_issues")
+
+    assert len(from_parquet) == len(from_json) == expected
+    assert from_parquet.to_dict("records") == from_json.to_dict("records")
+
+
+def test_load_frame_without_data(data_path):
+    """Verify load_frame() returns None when no data file exists."""
+    assert load_frame() is None
+
+
+def test_load_cached_data_parses_once_per_save(data_path):
+    """Verify repeated loads share one parse until the data is saved again."""
+    save_data(generate_production_data(days=2, seed=1))
+
+    first = load_cached_data()
+    assert load_cached_data() is first
+
+    save_data(generate_production_data(days=3, seed=2))
+    reloaded = load_cached_data()
+
+    assert reloaded is not first
+    assert len(reloaded["production"]) == 3
+
+
+def test_load_metric_arrays_grids_by_date_and_machine(data_path):
+    """Verify metric grids line up with the records and slice by date."""
+    data = generate_production_data(days=3, seed=1)
+    save_data(data)
+
+    arrays = load_metric_arrays()
+    dates = sorted(data["production"])
+    m = arrays.machines["CNC-001"]
+
+    assert arrays.dates == dates
+    assert (
+        arrays.parts[1, m] == data["production"][dates[1]]["CNC-001"]["parts_produced"]
+    )
+    assert arrays.present.all()
+    assert arrays.date_slice(dates[1], dates[2] + "T23:59:59") == slice(1, 3)
+
+
+def test_generate_production_data_is_seeded():
+    """Verify the same seed reproduces the same production records."""
+    first = generate_production_data(days=5, seed=42)
+    second = generate_production_data(days=5, seed=42)
+
+    assert first["production"] == second["production"]
+
+
+def test_generate_production_data_plants_scenarios():
+    """Verify the quality spike and breakdown land on days 15 and 22."""
+    data = generate_production_data(days=30, seed=0)
+    days = sorted(data["production"])
+
+    spike = data["production"][days[14]]["Assembly-001"]
+    assert spike["scrap_rate"] == 12.0
+    assert len(spike["quality_issues"]) == 4
+
+    breakdown = data["production"][days[21]]["Packaging-001"]
+    assert breakdown["downtime_hours"] == 4.0
+    assert breakdown["downtime_events"][0]["reason"] == "mechanical"
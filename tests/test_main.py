@@ -7,168 +7,627 @@ Tests the three functions extracted in PR #3:
 - execute_tool(): Tool execution and routing
 """
 
+import asyncio
+import copy
 import json
-from typing import Any, Dict, List, Optional
+import os
+import re
+from types import MappingProxyType, SimpleNamespace
+from typing import Any, Dict, Final, List, Mapping, Optional
 from unittest.mock import Mock, patch
 
 import pytest
 
-from src.main import _build_system_prompt, _get_chat_response, execute_tool
+from src.cache import ResponseCache
+from tests.conftest import (
+    EXISTING_HISTORY,
+    FOLLOW_UP_RESPONSE,
+    FROZEN_DATES,
+    fake_response,
+    fake_tool_call,
+    scripted_create,
+    tool_args_json,
+)
+
+# Arguments of every requested tool call, serialized once at import
+_TOOL_ARGS: Final[Mapping[str, str]] = MappingProxyType(
+    {"start_date": "2024-01-01", "end_date": "2024-01-07"}
+)
+_TOOL_ARGS_JSON: Final[str] = tool_args_json(**_TOOL_ARGS)
+
+# The tool_flow scenario's tool call and its assistant message, built once
+_TOOL_CALL_TEMPLATE: Final = fake_tool_call(
+    "call_123", "calculate_oee", _TOOL_ARGS_JSON
+)
+_ASSISTANT_TOOL_DUMP: Final[Dict[str, Any]] = {
+    "role": "assistant",
+    "content": None,
+    "tool_calls": [
+        {
+            "id": "call_123",
+            "function": {"name": "calculate_oee", "arguments": _TOOL_ARGS_JSON},
+        }
+    ],
+}
+
+# System prompt sent by every chat test
+_SYSTEM_PROMPT: Final[str] = "You are helpful."
+
+# Factory name, data dates, and machines the system prompt must mention
+_EXPECTED_PROMPT_TOKENS: Final[tuple[str, ...]] = (
+    "Demo Factory",
+    "2024-01-01",
+    "2024-01-30",
+    "CNC-001",
+    "Assembly-001",
+)
+_EXPECTED_PATTERN = re.compile("|".join(map(re.escape, _EXPECTED_PROMPT_TOKENS)))
+
+
+@pytest.fixture(autouse=True)
+def empty_tool_cache(mainmod):
+    """Start every test with an empty session tool cache."""
+    mainmod._TOOL_CACHE.clear()
+    yield
+    mainmod._TOOL_CACHE.clear()
 
 
 class TestBuildSystemPrompt:
     """Smoke tests for _build_system_prompt()."""
 
-    @patch("src.main.load_data")
-    def test_includes_factory_context(self, mock_load_data):
+    def test_includes_factory_context(self, mainmod):
         """Verify prompt includes factory name, dates, and machines."""
-        mock_load_data.return_value = {
-            "start_date": "2024-01-01T00:00:00",
-            "end_date": "2024-01-30T23:59:59",
-        }
+        prompt = mainmod._build_system_prompt(data_loader=lambda: FROZEN_DATES)
+
+        # Check key components present, in one scan of the prompt
+        missing = set(_EXPECTED_PROMPT_TOKENS) - set(_EXPECTED_PATTERN.findall(prompt))
+        assert not missing, f"Missing tokens: {missing}"
+
+
+class TestTrimHistory:
+    """Smoke tests for _trim_history()."""
+
+    def test_keeps_short_history(self, mainmod):
+        """Verify history under the limit is left alone."""
+        history = [
+            {"role": "user", "content": "Hi"},
+            {"role": "assistant", "content": "Hello"},
+        ]
+
+        mainmod._trim_history(history)
+
+        assert len(history) == 2
+
+    def test_trims_to_window_starting_at_user_message(self, mainmod):
+        """Verify long history is cut in place at a user message boundary."""
+        # Turns of user, assistant (tool call), tool result, assistant
+        turn = ["user", "assistant", "tool", "assistant"]
+        history = [
+            {"role": role, "content": str(i)}
+            for i, role in enumerate(
+                turn * (mainmod.MAX_HISTORY_MESSAGES // len(turn) + 1)
+            )
+        ]
+        original, latest = history, history[-1]
 
-        prompt = _build_system_prompt()
+        mainmod._trim_history(history)
 
-        # Check key components present
-        assert "Demo Factory" in prompt
-        assert "2024-01-01" in prompt
-        assert "2024-01-30" in prompt
-        assert "CNC-001" in prompt
-        assert "Assembly-001" in prompt
+        assert history is original
+        assert len(history) <= mainmod.HISTORY_WINDOW
+        assert history[0]["role"] == "user"
+        assert history[-1] is latest
+
+    def test_keeps_whole_turn_longer_than_window(self, mainmod):
+        """Verify an oversized latest turn is kept from its user message on."""
+        earlier = [
+            {"role": "user", "content": "Earlier question"},
+            {"role": "assistant", "content": "Earlier answer"},
+        ]
+        # One turn of repeated rounds of many parallel tool calls
+        rounds = (["assistant"] + ["tool"] * 12) * 3 + ["assistant"]
+        turn = [{"role": "user", "content": "Compare every machine"}] + [
+            {"role": role, "content": str(i)} for i, role in enumerate(rounds)
+        ]
+        history = earlier + turn
+        assert len(turn) > mainmod.HISTORY_WINDOW
+        assert len(history) > mainmod.MAX_HISTORY_MESSAGES
+
+        mainmod._trim_history(history)
+
+        assert history == turn
 
 
 class TestExecuteTool:
     """Smoke tests for execute_tool()."""
 
-    @patch("src.main.calculate_oee")
-    def test_routes_to_correct_function(self, mock_calculate_oee):
+    def test_routes_to_correct_function(self, mainmod):
         """Verify tool routing works correctly."""
-        mock_calculate_oee.return_value = {"oee": 85.5}
+        mock_calculate_oee = Mock(return_value={"oee": 85.5})
 
-        result = execute_tool(
-            "calculate_oee",
-            {"start_date": "2024-01-01", "end_date": "2024-01-07"},
+        result = mainmod.execute_tool(
+            "calculate_oee", _TOOL_ARGS, dispatch={"calculate_oee": mock_calculate_oee}
         )
 
-        mock_calculate_oee.assert_called_once_with(
-            start_date="2024-01-01", end_date="2024-01-07"
-        )
+        assert mock_calculate_oee.call_count == 1
+        assert mock_calculate_oee.call_args.kwargs == _TOOL_ARGS
+        assert not mock_calculate_oee.call_args.args
         assert result["oee"] == 85.5
 
-    def test_returns_error_for_unknown_tool(self):
-        """Verify unknown tools return error dict."""
-        result = execute_tool("nonexistent_tool", {})
+    def test_runs_tool_in_worker_pool_when_started(self, mainmod):
+        """Verify tools are submitted to the worker pool when one is running."""
+        mock_calculate_oee = Mock(return_value={"oee": 85.5})
+        pool = Mock()
+        pool.submit.return_value.result.return_value = {"oee": 85.5}
+
+        with patch.dict(
+            mainmod._TOOL_DISPATCH, {"calculate_oee": mock_calculate_oee}
+        ), patch.object(mainmod, "_tool_pool", pool):
+            result = mainmod._run_tool("calculate_oee", _TOOL_ARGS)
+
+        assert pool.submit.call_count == 1
+        assert pool.submit.call_args.args == (mock_calculate_oee,)
+        assert pool.submit.call_args.kwargs == _TOOL_ARGS
+        assert mock_calculate_oee.call_count == 0
+        assert result == {"oee": 85.5}
+
+    def test_reuses_session_result_for_same_arguments(self, mainmod):
+        """Verify identical tool calls in a session run the tool once."""
+        run = Mock(return_value={"oee": 85.5})
+
+        first = mainmod._execute_cached_tool(
+            None, "calculate_oee", {"start_date": "a", "end_date": "b"}, run
+        )
+        second = mainmod._execute_cached_tool(
+            None, "calculate_oee", {"end_date": "b", "start_date": "a"}, run
+        )
+
+        assert first == second == {"oee": 85.5}
+        assert run.call_count == 1
+
+    def test_reruns_tool_when_caching_is_off(self, mainmod, tmp_path):
+        """Verify chat --no-cache (cache mode "off") runs every tool call."""
+        cache = ResponseCache(str(tmp_path / "cache.sqlite"), mode="off")
+        run = Mock(return_value={"oee": 85.5})
+
+        for _ in range(3):
+            mainmod._execute_cached_tool(cache, "calculate_oee", dict(_TOOL_ARGS), run)
+
+        assert run.call_count == 3
+
+    def test_drops_session_results_when_data_file_changes(self, mainmod, tmp_path):
+        """Verify regenerated data is not answered from earlier session results."""
+        data_file = tmp_path / "production.json"
+        data_file.write_text("{}")
+        run = Mock(return_value={"oee": 85.5})
+
+        with patch.object(mainmod, "get_data_path", return_value=data_file):
+            mainmod._execute_cached_tool(None, "calculate_oee", dict(_TOOL_ARGS), run)
+            mtime_ns = data_file.stat().st_mtime_ns
+            os.utime(data_file, ns=(mtime_ns, mtime_ns + 1_000_000))
+            mainmod._execute_cached_tool(None, "calculate_oee", dict(_TOOL_ARGS), run)
+
+        assert run.call_count == 2
+
+    @pytest.mark.parametrize(
+        "tool_name,args,expected_substr",
+        [("nonexistent_tool", {}, "unknown")],
+        ids=["unknown_tool"],
+    )
+    def test_execute_tool_errors(self, mainmod, tool_name, args, expected_substr):
+        """Verify failing tool calls return an error dict."""
+        result = mainmod.execute_tool(tool_name, args)
 
         assert "error" in result
-        assert "unknown" in result["error"].lower()
+        assert expected_substr in result["error"].lower()
+
+
+def _simple_scenario():
+    """Plain reply (the client's default response); no tools run."""
+    return {"conversation_history": [], "user_message": "Hi"}, None, None
+
+
+def _tool_flow_scenario():
+    """One tool call, then a final answer; tool calls are recorded."""
+    calls = []
+
+    def fake_tool(name, args):
+        calls.append((name, args))
+        return {"oee": 85.5}
+
+    # First call: Claude requests tool; second call: final answer
+    tool_call = copy.copy(_TOOL_CALL_TEMPLATE)
+    create = scripted_create(
+        fake_response(tool_calls=[tool_call], model_dump=_ASSISTANT_TOOL_DUMP),
+        fake_response(content="The OEE is 85.5%"),
+    )
+    kwargs = {
+        "conversation_history": [],
+        "user_message": "What's the OEE?",
+        "execute_tool_fn": fake_tool,
+    }
+    return kwargs, create, calls
+
+
+def _preserves_history_scenario():
+    """Plain reply to a follow-up after one earlier exchange; the request is captured."""
+    captured = {}
+
+    # A plain closure records the one request without Mock's call bookkeeping
+    async def capture(**kwargs):
+        captured.update(kwargs)
+        return FOLLOW_UP_RESPONSE
+
+    # _get_chat_response only reads the history, so the shared tuple is safe
+    kwargs = {"conversation_history": EXISTING_HISTORY, "user_message": "New question"}
+    return kwargs, capture, captured
 
 
 class TestGetChatResponse:
     """Smoke tests for _get_chat_response()."""
 
-    def test_handles_simple_response_without_tools(self):
-        """Verify basic chat flow when Claude doesn't use tools."""
-        # Mock client that returns simple response
-        mock_client = Mock()
-        mock_message = Mock(content="Hello!", tool_calls=None)
-        mock_client.chat.completions.create.return_value = Mock(
-            choices=[Mock(message=mock_message)]
+    @pytest.mark.parametrize("scenario", ["simple", "tool_flow", "preserves_history"])
+    def test_chat_scenario(self, mainmod, mock_client, monkeypatch, scenario):
+        """Verify the basic chat flows against one shared client setup.
+
+        - simple: Claude answers without tools
+        - tool_flow: the tool calling loop runs a tool, then answers
+        - preserves_history: prior history is sent with the new message
+        """
+        build = {
+            "simple": _simple_scenario,
+            "tool_flow": _tool_flow_scenario,
+            "preserves_history": _preserves_history_scenario,
+        }[scenario]
+        # Each scenario returns its inputs, an optional create stand-in, and
+        # what it records (tool calls or the captured request)
+        kwargs, create, recorded = build()
+        if create is not None:
+            monkeypatch.setattr(mock_client.chat.completions, "create", create)
+
+        response_text, new_history = asyncio.run(
+            mainmod._get_chat_response(
+                client=mock_client, system_prompt=_SYSTEM_PROMPT, **kwargs
+            )
         )
 
-        response_text, new_history = _get_chat_response(
-            client=mock_client,
-            system_prompt="You are helpful.",
-            conversation_history=[],
-            user_message="Hi",
+        if scenario == "simple":
+            assert response_text == "Hello!"
+            assert len(new_history) == 2  # user message + assistant response
+            assert new_history[0]["role"] == "user"
+            assert new_history[1]["role"] == "assistant"
+        elif scenario == "tool_flow":
+            assert response_text == "The OEE is 85.5%"
+            # user, assistant (tool), tool result, assistant
+            assert len(new_history) == 4
+            assert recorded == [("calculate_oee", _TOOL_ARGS)]
+        else:
+            # Should have: system + 2 history + new user message
+            messages = recorded["messages"]
+            assert len(messages) == 4
+            assert messages[0]["role"] == "system"
+            assert messages[1] == EXISTING_HISTORY[0]
+            assert messages[2] == EXISTING_HISTORY[1]
+            assert messages[3]["role"] == "user"
+
+    def test_keeps_parallel_tool_results_in_order(
+        self, mainmod, mock_client, monkeypatch
+    ):
+        """Verify concurrent tool results are returned in tool call order."""
+        calls = []
+
+        def fake_tool(name, args):
+            calls.append(name)
+            return {"tool": name}
+
+        # Claude requests two tools in one turn
+        tool_calls = [
+            fake_tool_call(call_id, name, _TOOL_ARGS_JSON)
+            for call_id, name in [
+                ("call_1", "calculate_oee"),
+                ("call_2", "get_scrap_metrics"),
+            ]
+        ]
+        create = scripted_create(
+            fake_response(tool_calls=tool_calls, model_dump={"role": "assistant"}),
+            fake_response(content="Done"),
         )
-
-        assert response_text == "Hello!"
-        assert len(new_history) == 2  # user message + assistant response
-        assert new_history[0]["role"] == "user"
-        assert new_history[1]["role"] == "assistant"
-
-    @patch("src.main.execute_tool")
-    def test_handles_tool_calling_flow(self, mock_execute_tool):
-        """Verify tool calling loop executes tools and returns response."""
-        mock_execute_tool.return_value = {"oee": 85.5}
-
-        mock_client = Mock()
-
-        # First call: Claude requests tool
-        tool_call = Mock()
-        tool_call.id = "call_123"
-        tool_call.function = Mock()
-        tool_call.function.name = "calculate_oee"
-        tool_call.function.arguments = json.dumps(
-            {"start_date": "2024-01-01", "end_date": "2024-01-07"}
+        monkeypatch.setattr(mock_client.chat.completions, "create", create)
+
+        _, new_history = asyncio.run(
+            mainmod._get_chat_response(
+                client=mock_client,
+                system_prompt=_SYSTEM_PROMPT,
+                conversation_history=[],
+                user_message="OEE and scrap?",
+                execute_tool_fn=fake_tool,
+            )
         )
 
-        first_message = Mock(tool_calls=[tool_call])
-        first_message.model_dump = Mock(
-            return_value={
-                "role": "assistant",
-                "content": None,
-                "tool_calls": [
-                    {
-                        "id": "call_123",
-                        "function": {
-                            "name": "calculate_oee",
-                            "arguments": json.dumps(
-                                {"start_date": "2024-01-01", "end_date": "2024-01-07"}
-                            ),
-                        },
-                    }
-                ],
-            }
-        )
+        tool_messages = [m for m in new_history if m["role"] == "tool"]
+        assert [m["tool_call_id"] for m in tool_messages] == ["call_1", "call_2"]
+        assert json.loads(tool_messages[1]["content"]) == {"tool": "get_scrap_metrics"}
+        assert sorted(calls) == ["calculate_oee", "get_scrap_metrics"]
 
-        # Second call: Claude provides final answer
-        second_message = Mock(content="The OEE is 85.5%", tool_calls=None)
+    def test_stops_repeated_tool_calls(self, mainmod, mock_client):
+        """Verify a repeated tool call is not re-run and tools are capped per turn."""
+        calls = []
 
+        def fake_tool(name, args):
+            calls.append((name, args))
+            return {"oee": 85.5}
+
+        # Claude keeps asking for the same tool with the same arguments
+        looping = fake_response(
+            tool_calls=[fake_tool_call("call_123", "calculate_oee", _TOOL_ARGS_JSON)],
+            model_dump={"role": "assistant"},
+        )
         mock_client.chat.completions.create.side_effect = [
-            Mock(choices=[Mock(message=first_message)]),
-            Mock(choices=[Mock(message=second_message)]),
+            *[looping] * mainmod.MAX_TOOL_ITERATIONS,
+            fake_response(content="The OEE is 85.5%"),
         ]
 
-        response_text, new_history = _get_chat_response(
-            client=mock_client,
-            system_prompt="You are helpful.",
-            conversation_history=[],
-            user_message="What's the OEE?",
+        response_text, new_history = asyncio.run(
+            mainmod._get_chat_response(
+                client=mock_client,
+                system_prompt=_SYSTEM_PROMPT,
+                conversation_history=[],
+                user_message="What's the OEE?",
+                execute_tool_fn=fake_tool,
+            )
         )
 
-        # Verify response and tool execution
         assert response_text == "The OEE is 85.5%"
-        assert len(new_history) == 4  # user, assistant (tool), tool result, assistant
-        mock_execute_tool.assert_called_once()
-
-    def test_preserves_conversation_history(self):
-        """Verify existing conversation history is included in API calls."""
-        mock_client = Mock()
-        mock_message = Mock(content="Response", tool_calls=None)
-        mock_client.chat.completions.create.return_value = Mock(
-            choices=[Mock(message=mock_message)]
+        assert calls == [("calculate_oee", _TOOL_ARGS)]
+        tool_messages = [m for m in new_history if m["role"] == "tool"]
+        assert "error" in json.loads(tool_messages[1]["content"])
+        last_call = mock_client.chat.completions.create.call_args
+        assert last_call.kwargs["tool_choice"] == "none"
+
+    def test_ends_turn_when_tool_calls_continue_after_limit(self, mainmod, mock_client):
+        """Verify tool calls ignoring tool_choice "none" end the turn unrun."""
+        calls = []
+
+        def fake_tool(name, args):
+            calls.append((name, args))
+            return {"oee": 85.5}
+
+        # Every reply requests a new tool call, even with tools disabled
+        mock_client.chat.completions.create.side_effect = [
+            fake_response(
+                tool_calls=[
+                    fake_tool_call(
+                        f"call_{i}",
+                        "calculate_oee",
+                        tool_args_json(
+                            start_date="2024-01-01", end_date=f"2024-01-{i:02}"
+                        ),
+                    )
+                ],
+                model_dump={"role": "assistant"},
+            )
+            for i in range(1, mainmod.MAX_TOOL_ITERATIONS + 2)
+        ]
+
+        response_text, new_history = asyncio.run(
+            mainmod._get_chat_response(
+                client=mock_client,
+                system_prompt=_SYSTEM_PROMPT,
+                conversation_history=[],
+                user_message="What's the OEE?",
+                execute_tool_fn=fake_tool,
+            )
         )
 
-        existing_history = [
-            {"role": "user", "content": "Previous question"},
-            {"role": "assistant", "content": "Previous answer"},
+        create = mock_client.chat.completions.create
+        assert create.call_count == mainmod.MAX_TOOL_ITERATIONS + 1
+        assert create.call_args.kwargs["tool_choice"] == "none"
+        assert len(calls) == mainmod.MAX_TOOL_ITERATIONS
+        assert response_text == mainmod.TOOL_LIMIT_ANSWER
+        assert new_history[-1] == {"role": "assistant", "content": response_text}
+
+    def test_marks_system_prompt_and_tools_for_prompt_caching(
+        self, mainmod, mock_client
+    ):
+        """Verify the static prefix carries cache_control breakpoints."""
+        with patch.object(mainmod, "MODEL", "anthropic/claude-3.5-sonnet"):
+            asyncio.run(
+                mainmod._get_chat_response(
+                    client=mock_client,
+                    system_prompt="System prompt",
+                    conversation_history=[],
+                    user_message="What's the OEE?",
+                )
+            )
+
+        kwargs = mock_client.chat.completions.create.call_args.kwargs
+        system_block = kwargs["messages"][0]["content"][0]
+        assert system_block["text"] == "System prompt"
+        assert system_block["cache_control"] == {"type": "ephemeral"}
+        assert kwargs["tools"][-1]["cache_control"] == {"type": "ephemeral"}
+        assert "cache_control" not in kwargs["tools"][0]
+        assert kwargs["extra_headers"] == mainmod.PROMPT_CACHING_HEADERS
+
+    @pytest.mark.parametrize(
+        "user_message", ["What's the OEE?", "Thanks!"], ids=["model", "router"]
+    )
+    def test_sends_plain_prompt_to_non_anthropic_models(
+        self, mainmod, mock_client, user_message
+    ):
+        """Verify non-Anthropic models get no prompt caching markup."""
+        with patch.object(mainmod, "MODEL", "openai/gpt-4o"), patch.object(
+            mainmod, "ROUTER_MODEL", "openai/gpt-4o-mini"
+        ):
+            asyncio.run(
+                mainmod._get_chat_response(
+                    client=mock_client,
+                    system_prompt="System prompt",
+                    conversation_history=[],
+                    user_message=user_message,
+                )
+            )
+
+        kwargs = mock_client.chat.completions.create.call_args.kwargs
+        assert kwargs["messages"][0] == {"role": "system", "content": "System prompt"}
+        assert all("cache_control" not in tool for tool in kwargs.get("tools", ()))
+        assert "extra_headers" not in kwargs
+
+    def test_routes_chit_chat_to_router_model_without_tools(self, mainmod, mock_client):
+        """Verify messages with no data keywords skip tools and MODEL."""
+        with patch.object(mainmod, "ROUTER_MODEL", "cheap/model"):
+            asyncio.run(
+                mainmod._get_chat_response(
+                    client=mock_client,
+                    system_prompt=_SYSTEM_PROMPT,
+                    conversation_history=[],
+                    user_message="Thanks!",
+                )
+            )
+            asyncio.run(
+                mainmod._get_chat_response(
+                    client=mock_client,
+                    system_prompt=_SYSTEM_PROMPT,
+                    conversation_history=[],
+                    user_message="Scrap rate for CNC last week?",
+                )
+            )
+
+        chit_chat, data_question = mock_client.chat.completions.create.call_args_list
+        assert chit_chat.kwargs["model"] == "cheap/model"
+        assert chit_chat.kwargs["max_tokens"] == data_question.kwargs["max_tokens"] > 0
+        assert "tools" not in chit_chat.kwargs
+        assert data_question.kwargs["model"] != "cheap/model"
+        assert data_question.kwargs["tools"]
+
+    def test_keeps_follow_up_to_tool_answer_on_main_model(self, mainmod, mock_client):
+        """Verify a keyword-free follow-up after tool calls keeps MODEL and tools."""
+        history = [
+            {"role": "user", "content": "What's the OEE?"},
+            _ASSISTANT_TOOL_DUMP,
+            {"role": "tool", "tool_call_id": "call_123", "content": '{"oee": 85.5}'},
+            {"role": "assistant", "content": "The OEE is 85.5%"},
+        ]
+
+        with patch.object(mainmod, "ROUTER_MODEL", "cheap/model"):
+            asyncio.run(
+                mainmod._get_chat_response(
+                    client=mock_client,
+                    system_prompt=_SYSTEM_PROMPT,
+                    conversation_history=history,
+                    user_message="Why?",
+                )
+            )
+
+        kwargs = mock_client.chat.completions.create.call_args.kwargs
+        assert kwargs["model"] == mainmod.MODEL
+        assert kwargs["tools"]
+
+    def test_repeated_turn_is_answered_from_cache(self, mainmod, mock_client, tmp_path):
+        """Verify an identical turn skips the API when a cache is given."""
+        cache = ResponseCache(str(tmp_path / "cache.sqlite"))
+
+        results = [
+            asyncio.run(
+                mainmod._get_chat_response(
+                    client=mock_client,
+                    system_prompt=_SYSTEM_PROMPT,
+                    conversation_history=[],
+                    user_message="Hi",
+                    cache=cache,
+                )
+            )
+            for _ in range(2)
         ]
 
-        _get_chat_response(
-            client=mock_client,
-            system_prompt="System prompt",
-            conversation_history=existing_history,
-            user_message="New question",
+        assert results[0] == results[1]
+        assert results[1][0] == "Hello!"
+        assert mock_client.chat.completions.create.call_count == 1
+
+    def test_flags_and_skips_caching_truncated_answer(
+        self, mainmod, mock_client, tmp_path
+    ):
+        """Verify an answer cut off at max_tokens is flagged and not cached."""
+        cache = ResponseCache(str(tmp_path / "cache.sqlite"))
+        mock_client.chat.completions.create.return_value = fake_response(
+            content="CNC-001 OEE is", finish_reason="length"
         )
 
-        # Check that API call included existing history
-        call_args = mock_client.chat.completions.create.call_args
-        messages = call_args.kwargs["messages"]
+        for _ in range(2):
+            response_text, new_history = asyncio.run(
+                mainmod._get_chat_response(
+                    client=mock_client,
+                    system_prompt=_SYSTEM_PROMPT,
+                    conversation_history=[],
+                    user_message="OEE for every machine?",
+                    cache=cache,
+                )
+            )
+
+        assert response_text == "CNC-001 OEE is" + mainmod.TRUNCATION_NOTICE
+        assert new_history[-1]["content"] == "CNC-001 OEE is"
+        assert mock_client.chat.completions.create.call_count == 2
+
+    def test_streams_text_and_reassembles_tool_calls(self, mainmod, mock_client):
+        """Verify streamed deltas reach on_token and fragmented tool calls run."""
+        calls = []
+
+        def fake_tool(name, args):
+            calls.append((name, args))
+            return {"oee": 85.5}
+
+        def chunk(content=None, tool_calls=None, finish_reason=None):
+            """One streamed chunk with a single-choice delta."""
+            delta = SimpleNamespace(content=content, tool_calls=tool_calls)
+            choice = SimpleNamespace(delta=delta, finish_reason=finish_reason)
+            return SimpleNamespace(choices=[choice])
+
+        def tool_delta(call_id=None, name=None, arguments=None):
+            """One fragment of tool call 0."""
+            function = SimpleNamespace(name=name, arguments=arguments)
+            return [SimpleNamespace(index=0, id=call_id, function=function)]
+
+        async def stream(chunks):
+            for c in chunks:
+                yield c
+
+        # First stream: one tool call split across chunks; second: final text
+        streams = [
+            stream(
+                [
+                    chunk(
+                        tool_calls=tool_delta(
+                            "call_123", "calculate_oee", '{"start_date": '
+                        )
+                    ),
+                    chunk(
+                        tool_calls=tool_delta(
+                            arguments='"2024-01-01", "end_date": "2024-01-07"}'
+                        )
+                    ),
+                ]
+            ),
+            stream(
+                [
+                    chunk(content="The OEE "),
+                    chunk(content="is 85.5%", finish_reason="stop"),
+                ]
+            ),
+        ]
+        mock_client.chat.completions.create.side_effect = streams
+        tokens: List[str] = []
+
+        response_text, new_history = asyncio.run(
+            mainmod._get_chat_response(
+                client=mock_client,
+                system_prompt=_SYSTEM_PROMPT,
+                conversation_history=[],
+                user_message="What's the OEE?",
+                on_token=tokens.append,
+                execute_tool_fn=fake_tool,
+            )
+        )
 
-        # Should have: system + 2 history + new user message
-        assert len(messages) == 4
-        assert messages[0]["role"] == "system"
-        assert messages[1] == existing_history[0]
-        assert messages[2] == existing_history[1]
-        assert messages[3]["role"] == "user"
+        assert tokens == ["The OEE ", "is 85.5%"]
+        assert response_text == "The OEE is 85.5%"
+        assert calls == [("calculate_oee", _TOOL_ARGS)]
+        assert new_history[1]["tool_calls"][0]["id"] == "call_123"
+        assert mock_client.chat.completions.create.call_args.kwargs["stream"] is True
@@ -0,0 +1,119 @@
+"""
+Smoke tests for metrics functions.
+
+Tests the batched per-day metrics against their single-range counterparts:
+- calculate_oee_daily(): Daily OEE in one pass
+- get_scrap_metrics_daily(): Daily scrap metrics in one pass
+
+And the range totals shared by the single-range metrics.
+"""
+
+from typing import Any, Dict
+from unittest.mock import patch
+
+import pytest
+
+from src.data import load_metric_arrays, save_data
+from src.metrics import (
+    calculate_oee,
+    calculate_oee_daily,
+    get_downtime_analysis,
+    get_scrap_metrics,
+    get_scrap_metrics_daily,
+)
+
+
+def _machine_day(parts: int, scrap: int, downtime: float) -> Dict[str, Any]:
+    """Build a minimal per-machine day record."""
+    return {
+        "parts_produced": parts,
+        "good_parts": parts - scrap,
+        "scrap_parts": scrap,
+        "uptime_hours": 16.0 - downtime,
+        "downtime_hours": downtime,
+        "downtime_events": [],
+        "quality_issues": [],
+        "shifts": {},
+    }
+
+
+SAMPLE_DATA = {
+    "start_date": "2024-01-01T00:00:00",
+    "end_date": "2024-01-02T00:00:00",
+    "production": {
+        "2024-01-01": {
+            "CNC-001": _machine_day(800, 24, 0.5),
+            "Assembly-001": _machine_day(780, 94, 0.3),
+        },
+        "2024-01-02": {
+            "CNC-001": _machine_day(820, 25, 4.0),
+            "Assembly-001": _machine_day(790, 23, 0.6),
+        },
+    },
+}
+
+
+@pytest.fixture(autouse=True)
+def sample_data(tmp_path):
+    """Save SAMPLE_DATA to a temporary data file for every test."""
+    with patch("src.data.get_data_path", return_value=tmp_path / "production.json"):
+        save_data(SAMPLE_DATA)
+        yield
+
+
+class TestDailyMetrics:
+    """Smoke tests for the batched daily metric functions."""
+
+    @pytest.mark.parametrize("machine_name", [None, "Assembly-001"])
+    def test_oee_daily_matches_single_day_calls(self, machine_name):
+        """Verify each daily row equals calculate_oee() for that day."""
+        daily = calculate_oee_daily("2024-01-01", "2024-01-02", machine_name)
+
+        assert list(daily.index) == ["2024-01-01", "2024-01-02"]
+        for date, row in daily.iterrows():
+            expected = calculate_oee(date, date, machine_name)
+            assert row["oee"] == expected["oee"]
+            assert row["availability"] == expected["availability"]
+            assert row["quality"] == expected["quality"]
+
+    @pytest.mark.parametrize("machine_name", [None, "CNC-001"])
+    def test_scrap_daily_matches_single_day_calls(self, machine_name):
+        """Verify each daily row equals get_scrap_metrics() for that day."""
+        daily = get_scrap_metrics_daily("2024-01-01", "2024-01-02", machine_name)
+
+        assert list(daily.index) == ["2024-01-01", "2024-01-02"]
+        for date, row in daily.iterrows():
+            expected = get_scrap_metrics(date, date, machine_name)
+            assert row["total_scrap"] == expected["total_scrap"]
+            assert row["total_parts"] == expected["total_parts"]
+            assert row["scrap_rate"] == expected["scrap_rate"]
+
+    def test_empty_range_returns_empty_frame(self):
+        """Verify dates outside the data produce an empty result."""
+        daily = calculate_oee_daily("2023-01-01", "2023-01-05")
+
+        assert daily.empty
+        assert "oee" in daily.columns
+
+
+class TestRangeTotals:
+    """Smoke tests for totals shared across metric functions."""
+
+    def test_metrics_on_same_range_share_one_reduction(self):
+        """Verify OEE, scrap and downtime for one range reuse the same totals."""
+        oee = calculate_oee("2024-01-01", "2024-01-02", "CNC-001")
+        scrap = get_scrap_metrics("2024-01-01", "2024-01-02T23:59:59", "CNC-001")
+        downtime = get_downtime_analysis("2024-01-01", "2024-01-02", "CNC-001")
+
+        assert len(load_metric_arrays().range_totals) == 1
+        assert oee["total_parts"] == scrap["total_parts"] == 1620
+        assert scrap["total_scrap"] == 49
+        assert downtime["total_downtime_hours"] == 4.5
+
+    def test_reversed_range_has_no_data(self):
+        """Verify a start date after the end date selects no days."""
+        oee = calculate_oee("2024-01-02", "2023-12-31")
+        scrap = get_scrap_metrics("2024-01-02", "2023-12-31")
+
+        assert oee == {"error": "No data for specified date range"}
+        assert scrap["total_parts"] == scrap["total_scrap"] == 0